@@ -3,14 +3,14 @@ Varuna AI Agent - Agents Package
 LangGraph + Pydantic based agent workflow
 """
 
-from agents.scanner import scanner_agent, EmergencyScannerAgent
+from agents.scanner import get_scanner_agent, EmergencyScannerAgent
 from agents.orchestrator import orchestrator, ResourceOrchestrator
 from agents.learning import learning_agent, LearningAgent
 from agents.graph import varuna_agent, VarunaAgent, build_varuna_graph
 
 __all__ = [
     # Legacy agents
-    "scanner_agent",
+    "get_scanner_agent",
     "orchestrator", 
     "learning_agent",
     "EmergencyScannerAgent",
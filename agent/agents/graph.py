@@ -3,19 +3,57 @@ Varuna AI Agent - LangGraph Workflow
 Stateful agent using LangGraph for emergency response orchestration
 """
 
-from typing import Annotated, Literal, TypedDict, List, Optional
+from typing import Annotated, AsyncIterator, Callable, Dict, Literal, TypedDict, List, Optional, Tuple
+from collections import OrderedDict
+from contextlib import aclosing
+from contextvars import ContextVar
 from datetime import datetime
-import operator
+import asyncio
+from functools import lru_cache
+import hashlib
+import threading
+import time
 import uuid
 
-from pydantic import BaseModel, Field
-from langgraph.graph import StateGraph, END
+import numpy as np
+from pydantic import AliasChoices, BaseModel, Field, TypeAdapter
+from langgraph.config import get_stream_writer
+from langgraph.graph import StateGraph, START, END
+from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode
 from langchain_groq import ChatGroq
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, BaseMessage
+from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
 from langchain_core.prompts import ChatPromptTemplate
 
 from config import get_settings
+from agents.ids import IdFactory
+
+try:
+    import aiosqlite
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+except ImportError:  # checkpointing is optional
+    AsyncSqliteSaver = None
+
+
+# ============================================
+# Per-Run IDs & Timestamps
+# ============================================
+
+# Set by VarunaAgent.run; node tasks inherit them through the copied context
+_run_ids: ContextVar[Optional[IdFactory]] = ContextVar("varuna_run_ids", default=None)
+_run_now: ContextVar[Optional[datetime]] = ContextVar("varuna_run_now", default=None)
+
+
+def _new_id() -> str:
+    """ID from the current run's IdFactory, or a fresh uuid4 outside a run"""
+    factory = _run_ids.get()
+    return factory() if factory else str(uuid.uuid4())
+
+
+def _run_timestamp() -> datetime:
+    """Timestamp shared by every model created in the current run"""
+    return _run_now.get() or datetime.now()
 
 
 # ============================================
@@ -24,18 +62,18 @@ from config import get_settings
 
 class IncidentData(BaseModel):
     """Detected incident data"""
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    title: str
-    description: str
-    incident_type: str
-    severity: Literal["critical", "high", "medium", "low"]
-    location: str
-    distance_km: float
-    estimated_casualties: int
-    injury_types: List[str]
-    eta_minutes: int
-    confidence: float = Field(ge=0, le=1)
-    detected_at: datetime = Field(default_factory=datetime.now)
+    id: str = Field(default_factory=_new_id)
+    title: str = "Unknown"
+    description: str = ""
+    incident_type: str = "unknown"
+    severity: Literal["critical", "high", "medium", "low"] = "medium"
+    location: str = "Unknown"
+    distance_km: float = 10
+    estimated_casualties: int = 0
+    injury_types: List[str] = Field(default_factory=list)
+    eta_minutes: int = 30
+    confidence: float = Field(default=0.5, ge=0, le=1)
+    detected_at: datetime = Field(default_factory=_run_timestamp)
     source: str = "scanner"
 
 
@@ -50,30 +88,151 @@ class ResourceStatus(BaseModel):
 
 class ResourceRequest(BaseModel):
     """Request for resources from vendors"""
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    resource_type: str
-    quantity: int
-    urgency: Literal["critical", "high", "medium", "low"]
-    vendor_name: str
-    eta_minutes: int
+    id: str = Field(default_factory=_new_id)
+    resource_type: str = "supplies"
+    quantity: int = 10
+    urgency: Literal["critical", "high", "medium", "low"] = "medium"
+    vendor_name: str = Field(
+        default="Default Vendor",
+        validation_alias=AliasChoices("vendor_name", "vendor")
+    )
+    eta_minutes: int = 30
     status: str = "pending"
 
 
 class HospitalAlert(BaseModel):
     """Alert to nearby hospital"""
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    hospital_name: str
-    alert_type: Literal["awareness", "standby", "divert", "accept_overflow"]
-    message: str
-    patients_to_route: int = 0
+    id: str = Field(default_factory=_new_id)
+    hospital_name: str = Field(
+        default="Unknown",
+        validation_alias=AliasChoices("hospital_name", "hospital")
+    )
+    alert_type: Literal["awareness", "standby", "divert", "accept_overflow"] = "awareness"
+    message: str = ""
+    patients_to_route: int = Field(
+        default=0,
+        validation_alias=AliasChoices("patients_to_route", "patients")
+    )
 
 
 class AgentDecision(BaseModel):
     """Decision made by the agent"""
-    action: str
-    reasoning: str
-    priority: Literal["critical", "high", "medium", "low"]
-    timestamp: datetime = Field(default_factory=datetime.now)
+    action: str = ""
+    reasoning: str = ""
+    priority: Literal["critical", "high", "medium", "low"] = "medium"
+    timestamp: datetime = Field(default_factory=_run_timestamp)
+
+
+class ScannerResponse(BaseModel):
+    """JSON payload returned by the scanner LLM"""
+    incidents: List[IncidentData] = Field(default_factory=list)
+    analysis: str = ""
+
+
+class OrchestratorResponse(BaseModel):
+    """JSON payload returned by the orchestrator LLM"""
+    decisions: List[AgentDecision] = Field(default_factory=list)
+    resource_requests: List[ResourceRequest] = Field(default_factory=list)
+    hospital_alerts: List[HospitalAlert] = Field(default_factory=list)
+    summary: str = "Response plan generated."
+
+
+# Built once at import so each LLM response is parsed and validated in a single pass
+_SCANNER_ADAPTER = TypeAdapter(ScannerResponse)
+_INCIDENT_ADAPTER = TypeAdapter(IncidentData)
+_ORCHESTRATOR_ADAPTER = TypeAdapter(OrchestratorResponse)
+
+# Serialize whole result lists in one call instead of model_dump() per item.
+# mode="json" emits JSON-ready builtins (ISO datetimes) so callers need no further encoding.
+_INCIDENT_LIST_ADAPTER = TypeAdapter(List[IncidentData])
+_RESOURCE_LIST_ADAPTER = TypeAdapter(List[ResourceStatus])
+_DECISION_LIST_ADAPTER = TypeAdapter(List[AgentDecision])
+_REQUEST_LIST_ADAPTER = TypeAdapter(List[ResourceRequest])
+_ALERT_LIST_ADAPTER = TypeAdapter(List[HospitalAlert])
+
+# State models the checkpointer may restore
+_CHECKPOINT_TYPES = [
+    (__name__, model.__name__)
+    for model in (IncidentData, ResourceStatus, ResourceRequest, HospitalAlert, AgentDecision)
+]
+
+
+def _extract_json_bytes(content: str) -> bytes:
+    """Return the outermost JSON object in an LLM response, ignoring code fences"""
+    start = content.find("{")
+    end = content.rfind("}") + 1
+    if start < 0 or end <= start:
+        raise ValueError("No JSON object found in LLM response")
+    return content[start:end].encode()
+
+
+class IncidentStreamParser:
+    """
+    Pulls complete objects out of the "incidents" array of a scanner
+    response while it is still streaming.
+    
+    Tracks brace depth and string state across chunks, so each incident
+    is validated as soon as its closing brace arrives.
+    """
+    
+    __slots__ = ("_buf", "_pos", "_depth", "_start", "_in_string", "_escape", "_in_array", "_done")
+    
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0
+        self._depth = 0
+        self._start = 0
+        self._in_string = False
+        self._escape = False
+        self._in_array = False
+        self._done = False
+    
+    def feed(self, text: str) -> List[IncidentData]:
+        """Add a chunk and return the incidents it completed"""
+        self._buf += text
+        found: List[IncidentData] = []
+        if self._done:
+            return found
+        
+        buf = self._buf
+        if not self._in_array:
+            key = buf.find('"incidents"')
+            bracket = buf.find("[", key) if key >= 0 else -1
+            if bracket < 0:
+                return found
+            self._in_array = True
+            self._pos = bracket + 1
+        
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        found.append(_INCIDENT_ADAPTER.validate_json(buf[self._start:i + 1]))
+                    except ValueError:
+                        pass  # the full response is validated again at the end
+            elif ch == "]" and self._depth == 0:
+                self._done = True
+                break
+            i += 1
+        
+        self._pos = i
+        return found
 
 
 # ============================================
@@ -87,7 +246,7 @@ class VarunaState(TypedDict):
     scan_requested: bool
     
     # Conversation
-    messages: Annotated[List[BaseMessage], operator.add]
+    messages: Annotated[List[BaseMessage], add_messages]
     
     # Detected data
     incidents: List[IncidentData]
@@ -110,28 +269,33 @@ class VarunaState(TypedDict):
 
 
 # ============================================
-# LangGraph Nodes (Agent Functions)
+# LLM
 # ============================================
 
-def get_llm():
-    """Get LLM instance (Groq for fast inference)"""
+# Structured extraction runs fine on the small model; planning keeps the 70B one
+SCANNER_MODEL = "llama-3.1-8b-instant"
+ORCHESTRATOR_MODEL = "llama-3.3-70b-versatile"
+
+
+@lru_cache(maxsize=4)
+def get_llm(model_name: str = ORCHESTRATOR_MODEL):
+    """Get cached LLM instance per model (Groq for fast inference)
+
+    Call ``get_llm.cache_clear()`` after changing settings at runtime.
+    """
     settings = get_settings()
     return ChatGroq(
         api_key=settings.groq_api_key,
-        model_name="llama-3.3-70b-versatile",
+        model_name=model_name,
         temperature=0.1
     )
 
 
-def scanner_node(state: VarunaState) -> VarunaState:
-    """
-    SCANNER NODE: Detects and analyzes emergency incidents
-    Uses AI to classify and assess severity
-    """
-    llm = get_llm()
-    
-    # System prompt for incident analysis
-    system = """You are an Emergency Intelligence Scanner for a hospital system.
+# ============================================
+# Prompts
+# ============================================
+
+SCANNER_SYSTEM = """You are an Emergency Intelligence Scanner for a hospital system.
 Your job is to analyze potential emergency incidents and determine:
 1. Incident type (fire, accident, collapse, chemical, medical_emergency, natural_disaster)
 2. Severity level (critical, high, medium, low)
@@ -140,9 +304,9 @@ Your job is to analyze potential emergency incidents and determine:
 5. ETA for patient arrivals
 
 Respond in JSON format only:
-{
+{{
     "incidents": [
-        {
+        {{
             "title": "brief title",
             "description": "what happened",
             "incident_type": "type",
@@ -153,87 +317,345 @@ Respond in JSON format only:
             "injury_types": ["type1", "type2"],
             "eta_minutes": number,
             "confidence": 0.0-1.0
-        }
+        }}
     ],
     "analysis": "brief summary"
-}"""
-    
-    messages = [
-        SystemMessage(content=system),
-        HumanMessage(content=f"Analyze this situation for potential emergencies: {state['query']}")
+}}"""
+
+SCANNER_BATCH_SYSTEM = """You are an Emergency Intelligence Scanner for a hospital system.
+You will receive several independent situations, each tagged with a query_id.
+For EACH situation, analyze potential emergency incidents and determine:
+1. Incident type (fire, accident, collapse, chemical, medical_emergency, natural_disaster)
+2. Severity level (critical, high, medium, low)
+3. Estimated casualties
+4. Expected injury types
+5. ETA for patient arrivals
+
+Never mix incidents between situations.
+
+Respond in JSON format only, with one entry per query_id:
+{{
+    "batch": [
+        {{
+            "query_id": "the tag of the situation",
+            "incidents": [
+                {{
+                    "title": "brief title",
+                    "description": "what happened",
+                    "incident_type": "type",
+                    "severity": "level",
+                    "location": "location name",
+                    "distance_km": number,
+                    "estimated_casualties": number,
+                    "injury_types": ["type1", "type2"],
+                    "eta_minutes": number,
+                    "confidence": 0.0-1.0
+                }}
+            ],
+            "analysis": "brief summary"
+        }}
     ]
+}}"""
+
+ORCHESTRATOR_SYSTEM = """You are a Hospital Resource Orchestrator AI.
+Coordinate emergency response by:
+1. Prioritizing resource allocation
+2. Deciding vendor orders
+3. Coordinating with nearby hospitals
+4. Providing actionable recommendations
+
+Respond in JSON:
+{{
+    "decisions": [
+        {{"action": "what to do", "reasoning": "why", "priority": "critical|high|medium|low"}}
+    ],
+    "resource_requests": [
+        {{"resource_type": "type", "quantity": number, "urgency": "level", "vendor": "name"}}
+    ],
+    "hospital_alerts": [
+        {{"hospital": "name", "alert_type": "standby|divert|accept_overflow", "patients": number}}
+    ],
+    "summary": "executive summary of response plan"
+}}"""
+
+# Compiled once at import and reused for every call
+_SCANNER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", SCANNER_SYSTEM),
+    ("human", "Analyze this situation for potential emergencies: {query}")
+])
+
+_SCANNER_BATCH_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", SCANNER_BATCH_SYSTEM),
+    ("human", "Analyze each of these {count} situations for potential emergencies:\n{situations}")
+])
+
+_ORCHESTRATOR_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", ORCHESTRATOR_SYSTEM),
+    ("human", """INCIDENTS:
+{incidents_text}
+
+CURRENT RESOURCES:
+{resources_text}
+
+CAPACITY SCORE: {capacity_score}
+
+Generate an optimal response plan.""")
+])
+
+
+# ============================================
+# Scanner Micro-Batching
+# ============================================
+
+class BatchScannerItem(ScannerResponse):
+    """Scanner result for one query inside a batch"""
+    query_id: str
+
+
+class BatchScannerResponse(BaseModel):
+    """JSON payload returned by the scanner LLM for a batch of queries"""
+    batch: List[BatchScannerItem] = Field(default_factory=list)
+
+
+_BATCH_SCANNER_ADAPTER = TypeAdapter(BatchScannerResponse)
+
+
+IncidentCallback = Callable[[IncidentData], None]
+
+
+class ScanBatcher:
+    """
+    Collects scanner queries that arrive within a short window and sends
+    them to the LLM as a single batch prompt.
     
-    try:
-        response = llm.invoke(messages)
-        content = response.content
+    Queries are binned by length so a long description does not hold up
+    a batch of short ones. Each caller awaits a Future that is resolved
+    with its own slice of the batch response.
+    """
+    
+    def __init__(self, max_batch_size: int = 6, max_wait_seconds: float = 0.03, long_query_chars: int = 280):
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.long_query_chars = long_query_chars
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._bins: Dict[bool, List[Tuple[str, asyncio.Future, Optional[IncidentCallback]]]] = {}
+        self._timers: Dict[bool, asyncio.TimerHandle] = {}
+    
+    async def submit(self, query: str, on_incident: Optional[IncidentCallback] = None) -> ScannerResponse:
+        """
+        Queue a query and wait for its scan result
         
-        # Parse JSON from response
-        import json
-        # Extract JSON from markdown code blocks if present
-        if "```json" in content:
-            content = content.split("```json")[1].split("```")[0]
-        elif "```" in content:
-            content = content.split("```")[1].split("```")[0]
+        on_incident is called with each incident as soon as it is parsed,
+        when the query is scanned on its own (batched responses arrive whole).
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Pending work belongs to a previous event loop (e.g. another asyncio.run)
+            self._loop = loop
+            self._bins = {}
+            self._timers = {}
+        
+        bin_key = len(query) > self.long_query_chars
+        future = loop.create_future()
+        pending = self._bins.setdefault(bin_key, [])
+        pending.append((query, future, on_incident))
         
-        data = json.loads(content.strip())
+        if len(pending) >= self.max_batch_size:
+            self._flush(bin_key)
+        elif len(pending) == 1:
+            self._timers[bin_key] = loop.call_later(self.max_wait_seconds, self._flush, bin_key)
         
-        incidents = []
-        for inc in data.get("incidents", []):
-            incidents.append(IncidentData(
-                title=inc.get("title", "Unknown"),
-                description=inc.get("description", ""),
-                incident_type=inc.get("incident_type", "unknown"),
-                severity=inc.get("severity", "medium"),
-                location=inc.get("location", "Unknown"),
-                distance_km=inc.get("distance_km", 10),
-                estimated_casualties=inc.get("estimated_casualties", 0),
-                injury_types=inc.get("injury_types", []),
-                eta_minutes=inc.get("eta_minutes", 30),
-                confidence=inc.get("confidence", 0.5)
-            ))
+        return await future
+    
+    def _flush(self, bin_key: bool):
+        """Send everything queued in a bin to the LLM"""
+        timer = self._timers.pop(bin_key, None)
+        if timer:
+            timer.cancel()
+        batch = self._bins.pop(bin_key, [])
+        if batch:
+            self._loop.create_task(self._run_batch(batch))
+    
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future, Optional[IncidentCallback]]]):
+        """Scan a batch and route each result back to its caller"""
+        try:
+            if len(batch) == 1:
+                query, _, on_incident = batch[0]
+                results = [await self._scan_one(query, on_incident)]
+            else:
+                results = await self._scan_many([query for query, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+    
+    async def _scan_one(self, query: str, on_incident: Optional[IncidentCallback] = None) -> ScannerResponse:
+        # Stream the completion so incidents can be reported before decoding finishes
+        parser = IncidentStreamParser()
+        parts: List[str] = []
+        streamed: List[IncidentData] = []
+        async for chunk in get_llm(SCANNER_MODEL).astream(_SCANNER_PROMPT.format_messages(query=query)):
+            parts.append(chunk.content)
+            for incident in parser.feed(chunk.content):
+                streamed.append(incident)
+                if on_incident:
+                    on_incident(incident)
+        
+        data = _SCANNER_ADAPTER.validate_json(_extract_json_bytes("".join(parts)))
+        # Keep the objects (and IDs) already handed to listeners
+        if len(streamed) == len(data.incidents):
+            data.incidents = streamed
+        return data
+    
+    async def _scan_many(self, queries: List[str]) -> List[ScannerResponse]:
+        query_ids = [f"q{i}" for i in range(1, len(queries) + 1)]
+        situations = "\n".join(f"[{qid}] {query}" for qid, query in zip(query_ids, queries))
+        response = await get_llm(SCANNER_MODEL).ainvoke(
+            _SCANNER_BATCH_PROMPT.format_messages(count=len(queries), situations=situations)
+        )
+        data = _BATCH_SCANNER_ADAPTER.validate_json(_extract_json_bytes(response.content))
+        
+        by_id = {item.query_id: item for item in data.batch}
+        results = [by_id.get(qid) for qid in query_ids]
+        # Queries the LLM left out of the batch are scanned on their own, not reported empty
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            rescanned = await asyncio.gather(*(self._scan_one(queries[i]) for i in missing))
+            for i, result in zip(missing, rescanned):
+                results[i] = result
+        return results
+
+
+_scan_batcher = ScanBatcher()
+
+# Incident severities that route the graph to the orchestrator
+_ORCHESTRATE_SEVERITIES = frozenset({"critical", "high"})
+
+# Recent scan results keyed by normalized query hash (LRU order, oldest first);
+# entries expire quickly since the same query can describe a changed situation
+_SCAN_CACHE_SIZE = 1024
+_SCAN_CACHE_TTL_SECONDS = 120.0
+_scan_cache: "OrderedDict[str, Tuple[float, ScannerResponse]]" = OrderedDict()
+
+
+def _query_key(query: str) -> str:
+    """Stable hash of a normalized query"""
+    return hashlib.blake2b(query.strip().lower().encode(), digest_size=16).hexdigest()
+
+
+async def _scan_query(query: str, on_incident: Optional[IncidentCallback] = None) -> ScannerResponse:
+    """Scan a query, skipping the LLM for empty input and repeated queries"""
+    if not query.strip():
+        return ScannerResponse()
+    
+    key = _query_key(query)
+    cached = _scan_cache.get(key)
+    if cached is not None:
+        expires_at, data = cached
+        if expires_at > time.monotonic():
+            _scan_cache.move_to_end(key)
+            return data
+        del _scan_cache[key]
+    
+    # Only completed scans reach the cache; a failed scan raises past it
+    data = await _scan_batcher.submit(query, on_incident)
+    _scan_cache[key] = (time.monotonic() + _SCAN_CACHE_TTL_SECONDS, data)
+    if len(_scan_cache) > _SCAN_CACHE_SIZE:
+        _scan_cache.popitem(last=False)
+    return data
+
+
+# ============================================
+# LangGraph Nodes (Agent Functions)
+# ============================================
+
+async def scanner_node(state: VarunaState) -> dict:
+    """
+    SCANNER NODE: Detects and analyzes emergency incidents
+    Uses AI to classify and assess severity; concurrent runs share one batched LLM call
+    Empty and previously seen queries are answered without calling the LLM
+    Each incident is also emitted as a custom stream event as soon as it is known
+    """
+    writer = get_stream_writer()
+    sent = set()
+    
+    def emit(incident: IncidentData):
+        sent.add(incident.id)
+        writer({"type": "incident", "incident": _INCIDENT_ADAPTER.dump_python(incident, mode="json")})
+    
+    try:
+        data = await _scan_query(state["query"], emit)
+        incidents = data.incidents
+        
+        # Cache hits and batched scans arrive whole
+        for incident in incidents:
+            if incident.id not in sent:
+                emit(incident)
         
         # Determine if orchestration is needed
-        should_orchestrate = any(i.severity in ["critical", "high"] for i in incidents)
+        should_orchestrate = any(i.severity in _ORCHESTRATE_SEVERITIES for i in incidents)
         
+        # Nodes return only the keys they update; LangGraph merges them into the state
         return {
-            **state,
             "incidents": incidents,
             "should_orchestrate": should_orchestrate,
             "status": "analyzing",
             "current_node": "scanner",
-            "messages": state["messages"] + [AIMessage(content=f"Detected {len(incidents)} incidents")]
+            "messages": [AIMessage(content=f"Detected {len(incidents)} incidents")]
         }
         
     except Exception as e:
         return {
-            **state,
             "incidents": [],
             "status": "error",
             "response": f"Scanner error: {str(e)}",
-            "messages": state["messages"] + [AIMessage(content=f"Error: {str(e)}")]
+            "messages": [AIMessage(content=f"Error: {str(e)}")]
         }
 
 
-def analyzer_node(state: VarunaState) -> VarunaState:
+# Mock resource data (in production, fetch from Supabase)
+# Built once at import; values are trusted literals, so skip validation with model_construct
+_DEFAULT_RESOURCES: Tuple[ResourceStatus, ...] = (
+    ResourceStatus.model_construct(resource_type="beds", current_level=30.0, max_capacity=100.0, status="adequate", hours_remaining=None),
+    ResourceStatus.model_construct(resource_type="icu_beds", current_level=5.0, max_capacity=20.0, status="low", hours_remaining=None),
+    ResourceStatus.model_construct(resource_type="oxygen", current_level=65.0, max_capacity=100.0, status="adequate", hours_remaining=15.6),
+    ResourceStatus.model_construct(resource_type="ventilators", current_level=8.0, max_capacity=15.0, status="adequate", hours_remaining=None),
+    ResourceStatus.model_construct(resource_type="blood_units", current_level=40.0, max_capacity=200.0, status="low", hours_remaining=None),
+    ResourceStatus.model_construct(resource_type="staff", current_level=45.0, max_capacity=80.0, status="adequate", hours_remaining=None),
+)
+
+
+async def analyzer_fetch_node(state: VarunaState) -> dict:
     """
-    ANALYZER NODE: Assesses hospital capacity and resources
+    ANALYZER FETCH NODE: Loads hospital resource levels
+    Independent of the scan result, so it runs in parallel with the scanner
     """
-    # Mock resource data (in production, fetch from Supabase)
-    resources = [
-        ResourceStatus(resource_type="beds", current_level=30, max_capacity=100, status="adequate"),
-        ResourceStatus(resource_type="icu_beds", current_level=5, max_capacity=20, status="low"),
-        ResourceStatus(resource_type="oxygen", current_level=65, max_capacity=100, status="adequate", hours_remaining=15.6),
-        ResourceStatus(resource_type="ventilators", current_level=8, max_capacity=15, status="adequate"),
-        ResourceStatus(resource_type="blood_units", current_level=40, max_capacity=200, status="low"),
-        ResourceStatus(resource_type="staff", current_level=45, max_capacity=80, status="adequate"),
-    ]
+    return {"resources": list(_DEFAULT_RESOURCES)}
+
+
+def analyzer_node(state: VarunaState) -> dict:
+    """
+    ANALYZER NODE: Assesses hospital capacity against detected incidents
+    Joins the scanner and analyzer_fetch branches
+    """
+    resources = state["resources"]
+    
+    # Column (SoA) view of the resources for vectorized reductions
+    count = len(resources)
+    levels = np.fromiter((r.current_level for r in resources), dtype=np.float64, count=count)
+    capacities = np.fromiter((r.max_capacity for r in resources), dtype=np.float64, count=count)
+    statuses = np.array([r.status for r in resources])
     
     # Calculate capacity score
-    total_capacity = sum(r.current_level / r.max_capacity for r in resources) / len(resources)
+    total_capacity = float((levels / capacities).mean())
     
     # Check for critical resources
-    critical_resources = [r for r in resources if r.status == "critical"]
-    low_resources = [r for r in resources if r.status == "low"]
+    has_critical = bool((statuses == "critical").any())
     
     # Adjust for incidents
     total_casualties = sum(i.estimated_casualties for i in state["incidents"])
@@ -242,11 +664,9 @@ def analyzer_node(state: VarunaState) -> VarunaState:
     elif total_casualties > 10:
         total_capacity *= 0.85
     
-    should_alert = total_capacity < 0.5 or len(critical_resources) > 0
+    should_alert = total_capacity < 0.5 or has_critical
     
     return {
-        **state,
-        "resources": resources,
         "capacity_score": total_capacity,
         "should_alert": should_alert,
         "status": "orchestrating" if state["should_orchestrate"] else "complete",
@@ -254,12 +674,12 @@ def analyzer_node(state: VarunaState) -> VarunaState:
     }
 
 
-def orchestrator_node(state: VarunaState) -> VarunaState:
+async def orchestrator_node(state: VarunaState) -> dict:
     """
     ORCHESTRATOR NODE: Coordinates resources and generates response plan
     Uses AI to make strategic decisions
     """
-    llm = get_llm()
+    llm = get_llm(ORCHESTRATOR_MODEL)
     
     # Build context for AI
     incidents_text = "\n".join([
@@ -272,112 +692,43 @@ def orchestrator_node(state: VarunaState) -> VarunaState:
         for r in state["resources"]
     ])
     
-    system = """You are a Hospital Resource Orchestrator AI.
-Coordinate emergency response by:
-1. Prioritizing resource allocation
-2. Deciding vendor orders
-3. Coordinating with nearby hospitals
-4. Providing actionable recommendations
-
-Respond in JSON:
-{
-    "decisions": [
-        {"action": "what to do", "reasoning": "why", "priority": "critical|high|medium|low"}
-    ],
-    "resource_requests": [
-        {"resource_type": "type", "quantity": number, "urgency": "level", "vendor": "name"}
-    ],
-    "hospital_alerts": [
-        {"hospital": "name", "alert_type": "standby|divert|accept_overflow", "patients": number}
-    ],
-    "summary": "executive summary of response plan"
-}"""
-    
-    prompt = f"""INCIDENTS:
-{incidents_text}
-
-CURRENT RESOURCES:
-{resources_text}
-
-CAPACITY SCORE: {state['capacity_score']:.1%}
-
-Generate an optimal response plan."""
-    
     try:
-        response = llm.invoke([
-            SystemMessage(content=system),
-            HumanMessage(content=prompt)
-        ])
-        
-        import json
-        content = response.content
-        if "```json" in content:
-            content = content.split("```json")[1].split("```")[0]
-        elif "```" in content:
-            content = content.split("```")[1].split("```")[0]
-        
-        data = json.loads(content.strip())
-        
-        # Parse decisions
-        decisions = [
-            AgentDecision(
-                action=d.get("action", ""),
-                reasoning=d.get("reasoning", ""),
-                priority=d.get("priority", "medium")
-            )
-            for d in data.get("decisions", [])
-        ]
-        
-        # Parse resource requests
-        resource_requests = [
-            ResourceRequest(
-                resource_type=r.get("resource_type", "supplies"),
-                quantity=r.get("quantity", 10),
-                urgency=r.get("urgency", "medium"),
-                vendor_name=r.get("vendor", "Default Vendor"),
-                eta_minutes=30
-            )
-            for r in data.get("resource_requests", [])
-        ]
+        response = await llm.ainvoke(_ORCHESTRATOR_PROMPT.format_messages(
+            incidents_text=incidents_text,
+            resources_text=resources_text,
+            capacity_score=f"{state['capacity_score']:.1%}"
+        ))
         
-        # Parse hospital alerts
-        hospital_alerts = [
-            HospitalAlert(
-                hospital_name=h.get("hospital", "Unknown"),
-                alert_type=h.get("alert_type", "awareness"),
-                message=f"Emergency alert: {state['incidents'][0].title if state['incidents'] else 'Incident'}",
-                patients_to_route=h.get("patients", 0)
-            )
-            for h in data.get("hospital_alerts", [])
-        ]
+        # Parse and validate the JSON payload in one pass
+        data = _ORCHESTRATOR_ADAPTER.validate_json(_extract_json_bytes(response.content))
         
-        summary = data.get("summary", "Response plan generated.")
+        # Hospital alerts carry the lead incident title, which the LLM does not return
+        alert_message = f"Emergency alert: {state['incidents'][0].title if state['incidents'] else 'Incident'}"
+        for alert in data.hospital_alerts:
+            alert.message = alert_message
         
         return {
-            **state,
-            "decisions": decisions,
-            "resource_requests": resource_requests,
-            "hospital_alerts": hospital_alerts,
-            "response": summary,
+            "decisions": data.decisions,
+            "resource_requests": data.resource_requests,
+            "hospital_alerts": data.hospital_alerts,
+            "response": data.summary,
             "status": "complete",
             "current_node": "orchestrator"
         }
         
     except Exception as e:
         return {
-            **state,
             "response": f"Orchestration completed with limited AI analysis: {str(e)}",
             "status": "complete",
             "current_node": "orchestrator"
         }
 
 
-def responder_node(state: VarunaState) -> VarunaState:
+def responder_node(state: VarunaState) -> dict:
     """
     RESPONDER NODE: Generates final response for the user
+    Template-based summary; no LLM call
     """
-    llm = get_llm()
-    
     # Build summary
     incidents_count = len(state["incidents"])
     decisions_count = len(state["decisions"])
@@ -403,7 +754,6 @@ def responder_node(state: VarunaState) -> VarunaState:
 Status: {"⚠️ ALERT" if state['should_alert'] else "✅ Manageable"}"""
     
     return {
-        **state,
         "response": response,
         "status": "complete",
         "current_node": "responder"
@@ -437,7 +787,9 @@ def build_varuna_graph() -> StateGraph:
     Build the Varuna agent workflow graph
     
     Flow:
-    START -> scanner -> analyzer -> [orchestrator | responder] -> END
+    START -> [scanner, analyzer_fetch] -> analyzer -> [orchestrator | responder] -> END
+    
+    The scanner LLM call and the resource fetch run in parallel and join at the analyzer.
     """
     
     # Create the graph
@@ -445,15 +797,17 @@ def build_varuna_graph() -> StateGraph:
     
     # Add nodes
     workflow.add_node("scanner", scanner_node)
+    workflow.add_node("analyzer_fetch", analyzer_fetch_node)
     workflow.add_node("analyzer", analyzer_node)
     workflow.add_node("orchestrator", orchestrator_node)
     workflow.add_node("responder", responder_node)
     
-    # Set entry point
-    workflow.set_entry_point("scanner")
+    # Fan out from the entry point
+    workflow.add_edge(START, "scanner")
+    workflow.add_edge(START, "analyzer_fetch")
     
     # Add edges
-    workflow.add_edge("scanner", "analyzer")
+    workflow.add_edge(["scanner", "analyzer_fetch"], "analyzer")
     workflow.add_conditional_edges(
         "analyzer",
         should_orchestrate,
@@ -472,6 +826,38 @@ def build_varuna_graph() -> StateGraph:
 # Agent Interface
 # ============================================
 
+@lru_cache(maxsize=1)
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Long-lived event loop for run_sync, running in a daemon thread.
+    Reusing one loop keeps the Groq client's HTTP connections alive between calls.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="varuna-agent-loop", daemon=True).start()
+    return loop
+
+
+def _checkpoint_db() -> Optional[str]:
+    """SQLite path for checkpoints, or None when checkpointing is off"""
+    settings = get_settings()
+    # Workers would share one SQLite file, and a retry may land on any worker
+    if AsyncSqliteSaver is None or settings.workers > 1:
+        return None
+    return settings.checkpoint_db or None
+
+
+async def _prune_checkpoints(checkpointer: "AsyncSqliteSaver", conn: "aiosqlite.Connection"):
+    """Delete threads of failed or abandoned runs older than the retention window"""
+    cutoff = time.time() - get_settings().checkpoint_retention_seconds
+    async with conn.execute("SELECT DISTINCT thread_id FROM checkpoints") as cursor:
+        thread_ids = [row[0] async for row in cursor]
+    for thread_id in thread_ids:
+        # Thread IDs are "<query hash>:<unix seconds>:<random>"
+        parts = thread_id.split(":")
+        if len(parts) != 3 or not parts[1].isdigit() or int(parts[1]) < cutoff:
+            await checkpointer.adelete_thread(thread_id)
+
+
 class VarunaAgent:
     """
     Main interface for the Varuna LangGraph Agent
@@ -479,17 +865,85 @@ class VarunaAgent:
     
     def __init__(self):
         self.graph = build_varuna_graph()
+        self._active_threads: set = set()
     
-    async def run(self, query: str, scan: bool = True) -> dict:
+    async def run(self, query: str, scan: bool = True, resume_thread: Optional[str] = None) -> dict:
         """
         Run the agent workflow
         
         Args:
             query: User query or situation description
             scan: Whether to scan for incidents
+            resume_thread: thread_id of a failed run of the same query to
+                retry from its last checkpoint
             
         Returns:
-            Final state with response
+            Final state with response, as JSON-ready builtins
+        """
+        thread_id = self._thread_id(query, resume_thread)
+        final_state = None
+        async with aclosing(self._astream(query, scan, "values", thread_id)) as items:
+            async for _, chunk in items:
+                final_state = chunk
+        return self._result(final_state, thread_id)
+    
+    async def stream(self, query: str, scan: bool = True, resume_thread: Optional[str] = None) -> AsyncIterator[dict]:
+        """
+        Run the agent workflow, yielding events as they happen
+        
+        Yields ``{"type": "started", "thread_id": ...}`` first (the ID to pass
+        as resume_thread if the stream breaks off), then
+        ``{"type": "incident", "incident": {...}}`` for each incident as
+        soon as the scanner parses it, then ``{"type": "result", "result": {...}}``
+        with the same payload run() returns.
+        """
+        thread_id = self._thread_id(query, resume_thread)
+        yield {"type": "started", "thread_id": thread_id}
+        final_state = None
+        # Closed here if the consumer stops early, so cleanup runs in this context
+        async with aclosing(self._astream(query, scan, ["custom", "values"], thread_id)) as items:
+            async for mode, chunk in items:
+                if mode == "custom":
+                    yield chunk
+                else:
+                    final_state = chunk
+        yield {"type": "result", "result": self._result(final_state, thread_id)}
+    
+    def _thread_id(self, query: str, resume_thread: Optional[str]) -> Optional[str]:
+        """
+        Checkpoint thread for a run: the retried thread when it belongs to this
+        query and is not already running, otherwise a new one per request
+        """
+        if _checkpoint_db() is None:
+            return None
+        key = _query_key(query)
+        if resume_thread and resume_thread.startswith(key + ":") and resume_thread not in self._active_threads:
+            return resume_thread
+        return f"{key}:{int(time.time())}:{uuid.uuid4().hex[:12]}"
+    
+    async def prune_checkpoints(self):
+        """
+        Delete checkpoint threads of failed or abandoned runs past the
+        retention window; run at startup and periodically, not per request
+        """
+        checkpoint_db = _checkpoint_db()
+        if checkpoint_db is None:
+            return
+        async with aiosqlite.connect(checkpoint_db) as conn:
+            checkpointer = AsyncSqliteSaver(
+                conn, serde=JsonPlusSerializer(allowed_msgpack_modules=_CHECKPOINT_TYPES)
+            )
+            await checkpointer.setup()
+            await _prune_checkpoints(checkpointer, conn)
+    
+    async def _astream(self, query: str, scan: bool, stream_mode,
+                       thread_id: Optional[str]) -> AsyncIterator[Tuple[str, object]]:
+        """
+        Stream the graph as (mode, chunk) pairs, checkpointing each step to
+        SQLite under thread_id when configured. A retried thread that stopped
+        part-way resumes from its last checkpoint instead of repeating
+        completed nodes (e.g. the scanner LLM call); finished threads are
+        deleted, and failed ones by prune_checkpoints.
         """
         initial_state: VarunaState = {
             "query": query,
@@ -507,26 +961,57 @@ class VarunaAgent:
             "response": "",
             "status": "scanning"
         }
+        modes = [stream_mode] if isinstance(stream_mode, str) else stream_mode
         
-        # Run the graph
-        final_state = await self.graph.ainvoke(initial_state)
-        
+        # One ID source and one timestamp for every model created in this run
+        ids_token = _run_ids.set(IdFactory())
+        now_token = _run_now.set(datetime.now())
+        try:
+            if thread_id is None:
+                async for item in self.graph.astream(initial_state, stream_mode=modes):
+                    yield item
+                return
+            
+            self._active_threads.add(thread_id)
+            config = {"configurable": {"thread_id": thread_id}}
+            # Connection is scoped to the run so it never outlives its event loop
+            async with aiosqlite.connect(_checkpoint_db()) as conn:
+                checkpointer = AsyncSqliteSaver(
+                    conn, serde=JsonPlusSerializer(allowed_msgpack_modules=_CHECKPOINT_TYPES)
+                )
+                graph = self.graph.copy(update={"checkpointer": checkpointer})
+                # Only a retried thread has pending work; new threads start empty
+                snapshot = await graph.aget_state(config)
+                graph_input = None if snapshot.next else initial_state
+                async for item in graph.astream(graph_input, config, stream_mode=modes):
+                    yield item
+                # Nothing left to resume
+                await checkpointer.adelete_thread(thread_id)
+        finally:
+            self._active_threads.discard(thread_id)
+            _run_ids.reset(ids_token)
+            _run_now.reset(now_token)
+    
+    @staticmethod
+    def _result(final_state: VarunaState, thread_id: Optional[str] = None) -> dict:
+        """Shape the final graph state into the response payload"""
         return {
             "success": True,
             "response": final_state["response"],
-            "incidents": [i.model_dump() for i in final_state["incidents"]],
-            "resources": [r.model_dump() for r in final_state["resources"]],
-            "decisions": [d.model_dump() for d in final_state["decisions"]],
-            "resource_requests": [r.model_dump() for r in final_state["resource_requests"]],
-            "hospital_alerts": [a.model_dump() for a in final_state["hospital_alerts"]],
+            "incidents": _INCIDENT_LIST_ADAPTER.dump_python(final_state["incidents"], mode="json"),
+            "resources": _RESOURCE_LIST_ADAPTER.dump_python(final_state["resources"], mode="json"),
+            "decisions": _DECISION_LIST_ADAPTER.dump_python(final_state["decisions"], mode="json"),
+            "resource_requests": _REQUEST_LIST_ADAPTER.dump_python(final_state["resource_requests"], mode="json"),
+            "hospital_alerts": _ALERT_LIST_ADAPTER.dump_python(final_state["hospital_alerts"], mode="json"),
             "capacity_score": final_state["capacity_score"],
-            "status": final_state["status"]
+            "status": final_state["status"],
+            "thread_id": thread_id
         }
     
-    def run_sync(self, query: str, scan: bool = True) -> dict:
+    def run_sync(self, query: str, scan: bool = True, resume_thread: Optional[str] = None) -> dict:
         """Synchronous version of run"""
-        import asyncio
-        return asyncio.run(self.run(query, scan))
+        future = asyncio.run_coroutine_threadsafe(self.run(query, scan, resume_thread), _background_loop())
+        return future.result()
 
 
 # Singleton instance
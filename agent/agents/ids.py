@@ -0,0 +1,25 @@
+"""
+Varuna AI Agent - ID Generation
+Shared UUID source for the workflow and orchestrator
+"""
+
+import itertools
+import os
+import uuid
+
+
+class IdFactory:
+    """
+    UUID source for one workflow run.
+    Reads os.urandom once and XORs a counter into the low bits for each new ID.
+    """
+    
+    __slots__ = ("_base", "_counter")
+    
+    def __init__(self):
+        self._base = int.from_bytes(os.urandom(16), "big")
+        self._counter = itertools.count()
+    
+    def __call__(self) -> str:
+        # version=4 restores the RFC 4122 version/variant bits
+        return str(uuid.UUID(int=self._base ^ next(self._counter), version=4))
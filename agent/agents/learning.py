@@ -4,10 +4,12 @@ Post-incident analysis and continuous improvement
 """
 
 import asyncio
+from collections import OrderedDict
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 import uuid
 
+import orjson
 from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from supabase import create_client, Client
@@ -47,7 +49,9 @@ class LearningAgent:
                 pass
         
         # Incident cache (in production, this would be in database)
-        self.incident_cache: Dict[str, IncidentReport] = {}
+        # LRU-bounded so a long-running process doesn't grow without limit
+        self.incident_cache: "OrderedDict[str, IncidentReport]" = OrderedDict()
+        self.incident_cache_size = 10_000
         
         # Learning prompt
         self.learning_prompt = ChatPromptTemplate.from_messages([
@@ -106,6 +110,9 @@ Provide your analysis in JSON format:
     def cache_incident(self, incident: IncidentReport):
         """Cache an incident for later learning"""
         self.incident_cache[incident.id] = incident
+        self.incident_cache.move_to_end(incident.id)
+        if len(self.incident_cache) > self.incident_cache_size:
+            self.incident_cache.popitem(last=False)
     
     async def analyze(self, request: LearningRequest) -> LearningResponse:
         """
@@ -113,6 +120,8 @@ Provide your analysis in JSON format:
         """
         # Get cached incident or create placeholder
         incident = self.incident_cache.get(request.incident_id)
+        if incident:
+            self.incident_cache.move_to_end(request.incident_id)
         
         if not incident:
             # Create placeholder for demo
@@ -147,7 +156,7 @@ Provide your analysis in JSON format:
         # Generate insights
         insights = self._generate_insights(analysis)
         
-        # Create report
+        # Create report (validated: rating and improvements come from the LLM)
         report = PostIncidentReport(
             incident_id=request.incident_id,
             predicted_casualties=predicted_casualties,
@@ -164,7 +173,7 @@ Provide your analysis in JSON format:
         # Store report in database
         await self._store_report(report)
         
-        return LearningResponse(
+        return LearningResponse.model_construct(
             success=True,
             report=report,
             message=f"Analysis complete. Performance rating: {report.response_rating}"
@@ -226,15 +235,19 @@ Provide your analysis in JSON format:
     
     def _parse_analysis(self, content: str) -> Dict[str, Any]:
         """Parse AI analysis response"""
-        import json
+        fallback = {"performance_rating": "C", "insights": [], "process_improvements": []}
+        
+        # Responses without a JSON object are common; bail out before parsing
+        start = content.find("{")
+        end = content.rfind("}") + 1
+        if start < 0 or end <= start:
+            return fallback
+        
         try:
-            start = content.find("{")
-            end = content.rfind("}") + 1
-            if start >= 0 and end > start:
-                return json.loads(content[start:end])
-        except:
-            pass
-        return {"performance_rating": "C", "insights": [], "process_improvements": []}
+            analysis = orjson.loads(content[start:end].encode())
+        except orjson.JSONDecodeError:
+            return fallback
+        return analysis if isinstance(analysis, dict) else fallback
     
     def _get_fallback_analysis(self, casualty_accuracy: float, eta_accuracy: float) -> Dict[str, Any]:
         """Generate fallback analysis without AI"""
@@ -4,15 +4,23 @@ Coordinates resources, vendors, and nearby hospitals
 """
 
 import asyncio
+from bisect import bisect_right
+from contextlib import aclosing
 from datetime import datetime
-from typing import List, Dict, Any, Optional
-import uuid
+import hashlib
+import logging
+import secrets
+from typing import Callable, List, Dict, Any, Optional, Sequence
 
+import numpy as np
+import orjson
+from pydantic import TypeAdapter
 from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.messages import HumanMessage, SystemMessage
 from supabase import create_client, Client
 
-from config import get_settings, NEARBY_HOSPITALS, VENDORS
+from config import get_settings, Hospital, Vendor, NEARBY_HOSPITALS, VENDORS
+from agents.ids import IdFactory
 from redis_client import redis_client
 from models import (
     IncidentReport, OrchestrationResult, ResourceStatus,
@@ -21,6 +29,117 @@ from models import (
 )
 
 
+logger = logging.getLogger(__name__)
+
+# Strategy cache: incidents that quantize to the same signature reuse one LLM plan
+STRATEGY_CACHE_TTL_SECONDS = 600
+CASUALTY_BUCKETS = (5, 10, 20, 50, 100)
+
+# resource_status columns read below that exist in supabase_schema.sql;
+# the other fields fall back to their defaults
+RESOURCE_STATUS_COLUMNS = "icu_beds_total,icu_beds_occupied,ventilators_total"
+
+# Short-lived shared cache so bursts of orchestrations make one Supabase read
+RESOURCE_CACHE_KEY = "resource_status:current"
+RESOURCE_LOCK_KEY = "resource_status:lock"
+RESOURCE_CACHE_TTL_SECONDS = 3
+RESOURCE_LOCK_SECONDS = 5
+
+# Hospitals ordered by distance once at import (NEARBY_HOSPITALS is not sorted)
+_HOSPITAL_DISTANCES = np.array([h.distance_km for h in NEARBY_HOSPITALS], dtype=np.float32)
+NEAREST_HOSPITALS = tuple(NEARBY_HOSPITALS[i] for i in np.argsort(_HOSPITAL_DISTANCES, kind="stable")[:3])
+
+# Severities that always alert the nearest hospitals
+_ALERT_SEVERITIES = frozenset({SeverityLevel.CRITICAL, SeverityLevel.HIGH})
+
+# Mock resource levels, built once at import (used when Supabase is unavailable)
+MOCK_RESOURCES = (
+    ResourceStatus(resource_type="beds", current_level=30, capacity=100, status="adequate"),
+    ResourceStatus(resource_type="icu_beds", current_level=5, capacity=20, status="low"),
+    ResourceStatus(resource_type="oxygen", current_level=65, capacity=100, status="adequate", hours_remaining=15.6),
+    ResourceStatus(resource_type="ventilators", current_level=8, capacity=15, status="adequate"),
+    ResourceStatus(resource_type="blood_units", current_level=80, capacity=200, status="low"),
+    ResourceStatus(resource_type="staff_on_duty", current_level=45, capacity=80, status="adequate"),
+)
+
+# Fallback capacity-score deductions
+SEVERITY_PENALTIES = {SeverityLevel.CRITICAL: 0.3, SeverityLevel.HIGH: 0.2}
+STATUS_PENALTIES = {"critical": 0.15, "low": 0.08}
+
+# Dump whole lists to JSON-ready builtins in one pass (datetimes as ISO strings)
+_RESOURCE_LIST_ADAPTER = TypeAdapter(List[ResourceStatus])
+_REQUEST_LIST_ADAPTER = TypeAdapter(List[ResourceRequest])
+_ALERT_LIST_ADAPTER = TypeAdapter(List[HospitalAlert])
+
+
+# Strategy arrays reported while the LLM response is still streaming
+STREAMED_STRATEGY_FIELDS = ("vendor_orders", "hospital_coordination")
+
+
+class StrategyStreamParser:
+    """
+    Reports top-level array fields of a streaming strategy response as
+    soon as their closing bracket arrives.
+    
+    Tracks string state and nesting depth across chunks; only arrays
+    directly under the root object are considered.
+    """
+    
+    def __init__(self, fields: tuple):
+        self.fields = fields
+        self._buf = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string = ""
+        self._key = ""
+        self._field = ""
+        self._start = 0
+    
+    def feed(self, text: str) -> List[tuple]:
+        """Add a chunk and return the (field, value) pairs it completed"""
+        self._buf += text
+        buf = self._buf
+        found = []
+        
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = buf[self._string_start:i]
+            elif ch == '"':
+                self._in_string = True
+                self._string_start = i + 1
+            elif ch == ":" and self._depth == 1:
+                self._key = self._last_string
+            elif ch in "{[":
+                if ch == "[" and self._depth == 1 and self._key in self.fields:
+                    self._field = self._key
+                    self._start = i
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._field and self._depth == 1:
+                    try:
+                        found.append((self._field, orjson.loads(buf[self._start:i + 1].encode())))
+                    except orjson.JSONDecodeError:
+                        pass  # the full response is parsed again at the end
+                    self._field = ""
+            i += 1
+        
+        self._pos = i
+        return found
+
+
 class ResourceOrchestrator:
     """
     AI Agent for orchestrating hospital resources during emergencies
@@ -46,11 +165,32 @@ class ResourceOrchestrator:
                     self.settings.supabase_key
                 )
             except Exception as e:
-                print(f"Supabase connection error: {e}")
+                logger.warning("Supabase connection error: %s", e)
+        
+        # Supabase availability is fixed at startup, so pick the resource source once
+        self._get_resource_status = (
+            self._get_resource_status_supabase if self.supabase else self._get_resource_status_mock
+        )
+        
+        # In-flight Supabase resource fetch shared by concurrent callers
+        self._resource_fetch: Optional[asyncio.Future] = None
+        
+        # Lookup indexes over the static vendor and hospital networks
+        self._vendors_by_resource: Dict[str, Vendor] = {}
+        for v in VENDORS:
+            self._vendors_by_resource.setdefault(v.resource_type, v)
+        self._hospitals_by_name_lower = [(h.name.lower(), h) for h in NEARBY_HOSPITALS]
+        self._hospital_by_name_lower = dict(reversed(self._hospitals_by_name_lower))
+        
+        # NEARBY_HOSPITALS is static, so its prompt text only needs building once
+        self._hospital_str_cached = self._format_hospitals(NEARBY_HOSPITALS)
         
         # Strategy prompt
-        self.strategy_prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are a Hospital Resource Strategist AI.
+        # Static instructions and the JSON schema come first so providers can
+        # reuse the cached prefix; per-incident fields are only at the tail.
+        # The system message is built once and reused; the human message is a
+        # plain format string, skipping ChatPromptTemplate rendering per call.
+        self._system_msg = SystemMessage(content="""You are a Hospital Resource Strategist AI.
 Your role is to analyze incoming emergency incidents and recommend optimal resource allocation.
 
 You have access to:
@@ -62,8 +202,25 @@ Provide strategic recommendations that prioritize:
 1. Patient safety and care quality
 2. Resource efficiency
 3. System-wide coordination
-4. Surge capacity management"""),
-            ("human", """Analyze this emergency situation:
+4. Surge capacity management
+
+Provide your strategic recommendations in this JSON format:
+{
+    "overall_assessment": "brief situation assessment",
+    "capacity_score": <0-1 score of current capacity to handle>,
+    "resource_priorities": [
+        {"resource": "name", "action": "order/conserve/redistribute", "urgency": "critical/high/medium/low", "reason": "why"}
+    ],
+    "hospital_coordination": [
+        {"hospital": "name", "action": "alert/request_beds/divert_to", "patients_to_send": <number>, "reason": "why"}
+    ],
+    "vendor_orders": [
+        {"vendor_type": "oxygen/blood/medications/equipment", "quantity": "amount", "urgency": "critical/high/medium"}
+    ],
+    "staffing_recommendations": ["list of staffing actions"],
+    "contingency_plans": ["backup plans if situation worsens"]
+}""")
+        self._human_fmt = """Analyze this emergency situation:
 
 INCIDENT:
 - Type: {incident_type}
@@ -77,25 +234,7 @@ CURRENT RESOURCES:
 {resource_status}
 
 NEARBY HOSPITALS:
-{hospital_status}
-
-Provide your strategic recommendations in this JSON format:
-{{
-    "overall_assessment": "brief situation assessment",
-    "capacity_score": <0-1 score of current capacity to handle>,
-    "resource_priorities": [
-        {{"resource": "name", "action": "order/conserve/redistribute", "urgency": "critical/high/medium/low", "reason": "why"}}
-    ],
-    "hospital_coordination": [
-        {{"hospital": "name", "action": "alert/request_beds/divert_to", "patients_to_send": <number>, "reason": "why"}}
-    ],
-    "vendor_orders": [
-        {{"vendor_type": "oxygen/blood/medications/equipment", "quantity": "amount", "urgency": "critical/high/medium"}}
-    ],
-    "staffing_recommendations": ["list of staffing actions"],
-    "contingency_plans": ["backup plans if situation worsens"]
-}}""")
-        ])
+{hospital_status}"""
     
     async def orchestrate(self, request: OrchestrationRequest) -> OrchestrationResponse:
         """
@@ -103,55 +242,64 @@ Provide your strategic recommendations in this JSON format:
         """
         incident = request.incident
         
-        # 1. Get current resource status
-        resources = await self._get_resource_status()
+        # 1-2. Get current resource status and hospital network status concurrently
+        resources, hospitals = await asyncio.gather(
+            self._get_resource_status(),
+            asyncio.to_thread(self._get_hospital_status)
+        )
         
-        # 2. Get hospital network status
-        hospitals = self._get_hospital_status()
+        # One timestamp and one ID source for every request and alert in this orchestration
+        now = datetime.now()
+        new_id = IdFactory()
+        
+        # Vendor and hospital matching start as soon as their arrays finish
+        # streaming, while the LLM is still writing the rest of the plan
+        early: Dict[str, tuple] = {}
+        
+        def on_field(key: str, value: Any):
+            # A matching error must not abort the stream or pass for an LLM failure;
+            # the field is matched again from the full plan below, which raises it
+            try:
+                if key == "vendor_orders":
+                    early[key] = (value, self._generate_resource_requests(incident, {key: value}, now, new_id))
+                elif key == "hospital_coordination":
+                    early[key] = (value, self._generate_hospital_alerts(incident, {key: value}, now, new_id))
+            except Exception as e:
+                logger.warning("Early %s matching failed: %s", key, e)
         
         # 3. Get AI strategy recommendations
-        strategy = await self._get_ai_strategy(incident, resources, hospitals)
+        strategy = await self._get_ai_strategy(incident, resources, hospitals, on_field)
         
         # 4. Generate resource requests
-        resource_requests = self._generate_resource_requests(incident, strategy)
+        if "vendor_orders" in early and early["vendor_orders"][0] == strategy.get("vendor_orders"):
+            resource_requests = early["vendor_orders"][1]
+        else:
+            resource_requests = self._generate_resource_requests(incident, strategy, now, new_id)
         
         # 5. Generate hospital alerts
-        hospital_alerts = self._generate_hospital_alerts(incident, strategy)
+        if "hospital_coordination" in early and early["hospital_coordination"][0] == strategy.get("hospital_coordination"):
+            hospital_alerts = early["hospital_coordination"][1]
+        else:
+            hospital_alerts = self._generate_hospital_alerts(incident, strategy, now, new_id)
         
         # 6. Compile recommendations
         recommendations = self._compile_recommendations(strategy)
         
         # WAR ROOM LOGIC: If Critical, require approval
         requires_approval = incident.severity == SeverityLevel.CRITICAL
-        alert_id = None
+        alert_task: Optional[asyncio.Task] = None
         
         if requires_approval and self.supabase:
-            try:
-                # Create pending alert
-                alert_data = {
-                    "incident_type": incident.type,
-                    "severity": incident.severity,
-                    "location": incident.location.address,
-                    "description": incident.description,
-                    "recommended_actions": {
-                        "resource_requests": [r.model_dump() for r in resource_requests],
-                        "hospital_alerts": [h.model_dump() for h in hospital_alerts],
-                        "strategy": strategy
-                    },
-                    "status": "pending"
-                }
-                
-                response = self.supabase.table("incident_alerts").insert(alert_data).execute()
-                if response.data:
-                    alert_id = response.data[0]['id']
-                    print(f"⚠️ CRITICAL INCIDENT: Paused for War Room approval. Alert ID: {alert_id}")
-            except Exception as e:
-                print(f"Error creating war room alert: {e}")
+            # Insert the pending alert while the result is being built
+            alert_task = asyncio.create_task(
+                self._create_war_room_alert(incident, resource_requests, hospital_alerts, strategy)
+            )
 
         # If approval required, do NOT execute auto-requests yet
         final_resource_requests = [] if requires_approval else (resource_requests if request.auto_request_resources else [])
         final_hospital_alerts = [] if requires_approval else (hospital_alerts if request.auto_alert_hospitals else [])
 
+        # Validated: capacity_score comes from the LLM and must stay within [0, 1]
         result = OrchestrationResult(
             incident_id=incident.id,
             resource_status=resources,
@@ -166,74 +314,173 @@ Provide your strategic recommendations in this JSON format:
         if requires_approval:
             message += " [PAUSED: Awaiting War Room Approval]"
         
-        return OrchestrationResponse(
+        if alert_task:
+            await alert_task
+        
+        return OrchestrationResponse.model_construct(
             success=True,
             result=result,
             message=message
         )
     
-    async def _get_resource_status(self) -> List[ResourceStatus]:
-        """Get current resource levels from Supabase or mock data"""
-        resources = []
+    async def _create_war_room_alert(
+        self,
+        incident: IncidentReport,
+        resource_requests: List[ResourceRequest],
+        hospital_alerts: List[HospitalAlert],
+        strategy: Dict[str, Any]
+    ) -> Optional[str]:
+        """Create a pending War Room alert for a critical incident"""
+        alert_data = {
+            "incident_type": incident.type,
+            "severity": incident.severity,
+            "location": incident.location.address,
+            "description": incident.description,
+            "recommended_actions": {
+                "resource_requests": _REQUEST_LIST_ADAPTER.dump_python(resource_requests, mode="json"),
+                "hospital_alerts": _ALERT_LIST_ADAPTER.dump_python(hospital_alerts, mode="json"),
+                "strategy": strategy
+            },
+            "status": "pending"
+        }
+        
+        try:
+            response = await asyncio.to_thread(
+                lambda: self.supabase.table("incident_alerts").insert(alert_data).execute()
+            )
+        except Exception as e:
+            logger.warning("Error creating war room alert: %s", e)
+            return None
+        
+        if not response.data:
+            return None
+        alert_id = response.data[0]['id']
+        logger.warning("CRITICAL INCIDENT: Paused for War Room approval. Alert ID: %s", alert_id)
+        return alert_id
+    
+    async def _get_resource_status_supabase(self) -> List[ResourceStatus]:
+        """Get current resource levels from Supabase, falling back to mock data"""
+        resources = await self._get_cached_resource_status()
+        if resources:
+            return resources
+        return await self._get_resource_status_mock()
+    
+    async def _get_resource_status_mock(self) -> List[ResourceStatus]:
+        """Mock resource levels used when Supabase is not configured"""
+        return list(MOCK_RESOURCES)
+    
+    async def _get_cached_resource_status(self) -> Optional[List[ResourceStatus]]:
+        """
+        Resource levels from a short-lived Redis cache, fetching from Supabase
+        on a miss. Concurrent misses share a single fetch.
+        """
+        cached = await redis_client.get_json(RESOURCE_CACHE_KEY)
+        if cached:
+            return [ResourceStatus(**r) for r in cached]
         
-        if self.supabase:
+        # Callers in this process share one in-flight fetch
+        fetch = self._resource_fetch
+        if fetch is None or fetch.done() or fetch.get_loop() is not asyncio.get_running_loop():
+            fetch = self._resource_fetch = asyncio.ensure_future(self._fetch_resource_status())
+        return await asyncio.shield(fetch)
+    
+    async def _fetch_resource_status(self) -> Optional[List[ResourceStatus]]:
+        """Fetch resource levels from Supabase and refresh the cache"""
+        # Across processes, only the lock holder queries Supabase; the rest
+        # poll for its result for as long as the lock can be held, taking the
+        # lock over if the holder finishes without caching a result
+        token = secrets.token_hex(16)
+        locked = await redis_client.set_nx(RESOURCE_LOCK_KEY, token, ex=RESOURCE_LOCK_SECONDS)
+        if redis_client.enabled and not locked:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + RESOURCE_LOCK_SECONDS
+            while loop.time() < deadline:
+                await asyncio.sleep(0.05)
+                cached = await redis_client.get_json(RESOURCE_CACHE_KEY)
+                if cached:
+                    return [ResourceStatus(**r) for r in cached]
+                locked = await redis_client.set_nx(RESOURCE_LOCK_KEY, token, ex=RESOURCE_LOCK_SECONDS)
+                if locked:
+                    break
+        
+        try:
+            # Fetch from resource_status table
+            # supabase-py is blocking; keep the round-trip off the event loop
             try:
-                # Fetch from resource_status table
-                response = self.supabase.table("resource_status").select("*").limit(1).execute()
-                if response.data:
-                    data = response.data[0]
-                    resources = [
-                        ResourceStatus(
-                            resource_type="beds",
-                            current_level=data.get("beds_total", 100) - data.get("beds_occupied", 70),
-                            capacity=data.get("beds_total", 100),
-                            status=self._calculate_status(data.get("beds_total", 100) - data.get("beds_occupied", 70), data.get("beds_total", 100)),
-                            hours_remaining=None
-                        ),
-                        ResourceStatus(
-                            resource_type="icu_beds",
-                            current_level=data.get("icu_beds_total", 20) - data.get("icu_beds_occupied", 15),
-                            capacity=data.get("icu_beds_total", 20),
-                            status=self._calculate_status(data.get("icu_beds_total", 20) - data.get("icu_beds_occupied", 15), data.get("icu_beds_total", 20)),
-                            hours_remaining=None
-                        ),
-                        ResourceStatus(
-                            resource_type="oxygen",
-                            current_level=data.get("oxygen_supply", 75),
-                            capacity=100,
-                            status=self._calculate_status(data.get("oxygen_supply", 75), 100),
-                            hours_remaining=data.get("oxygen_supply", 75) * 0.24
-                        ),
-                        ResourceStatus(
-                            resource_type="ventilators",
-                            current_level=data.get("ventilators_available", 8),
-                            capacity=data.get("ventilators_total", 15),
-                            status=self._calculate_status(data.get("ventilators_available", 8), data.get("ventilators_total", 15)),
-                            hours_remaining=None
-                        ),
-                        ResourceStatus(
-                            resource_type="blood_units",
-                            current_level=data.get("blood_units", 120),
-                            capacity=200,
-                            status=self._calculate_status(data.get("blood_units", 120), 200),
-                            hours_remaining=None
-                        ),
-                    ]
-                    return resources
+                response = await asyncio.to_thread(
+                    lambda: self.supabase.table("resource_status").select(RESOURCE_STATUS_COLUMNS).limit(1).execute()
+                )
             except Exception as e:
-                print(f"Error fetching resources: {e}")
-        
-        # Mock data fallback
-        return [
-            ResourceStatus(resource_type="beds", current_level=30, capacity=100, status="adequate"),
-            ResourceStatus(resource_type="icu_beds", current_level=5, capacity=20, status="low"),
-            ResourceStatus(resource_type="oxygen", current_level=65, capacity=100, status="adequate", hours_remaining=15.6),
-            ResourceStatus(resource_type="ventilators", current_level=8, capacity=15, status="adequate"),
-            ResourceStatus(resource_type="blood_units", current_level=80, capacity=200, status="low"),
-            ResourceStatus(resource_type="staff_on_duty", current_level=45, capacity=80, status="adequate"),
-        ]
+                logger.warning("Error fetching resources: %s", e)
+                return None
+            if not response.data:
+                # Empty table: cache the mock levels too, so waiters and
+                # later misses stop re-querying Supabase until the TTL lapses
+                resources = list(MOCK_RESOURCES)
+                await self._cache_resource_status(resources)
+                return resources
+            
+            data = response.data[0]
+            beds_total = data.get("beds_total", 100)
+            beds_available = beds_total - data.get("beds_occupied", 70)
+            icu_total = data.get("icu_beds_total", 20)
+            icu_available = icu_total - data.get("icu_beds_occupied", 15)
+            oxygen = data.get("oxygen_supply", 75)
+            ventilators = data.get("ventilators_available", 8)
+            ventilators_total = data.get("ventilators_total", 15)
+            blood_units = data.get("blood_units", 120)
+            
+            resources = [
+                ResourceStatus(
+                    resource_type="beds",
+                    current_level=beds_available,
+                    capacity=beds_total,
+                    status=self._calculate_status(beds_available, beds_total),
+                    hours_remaining=None
+                ),
+                ResourceStatus(
+                    resource_type="icu_beds",
+                    current_level=icu_available,
+                    capacity=icu_total,
+                    status=self._calculate_status(icu_available, icu_total),
+                    hours_remaining=None
+                ),
+                ResourceStatus(
+                    resource_type="oxygen",
+                    current_level=oxygen,
+                    capacity=100,
+                    status=self._calculate_status(oxygen, 100),
+                    hours_remaining=oxygen * 0.24
+                ),
+                ResourceStatus(
+                    resource_type="ventilators",
+                    current_level=ventilators,
+                    capacity=ventilators_total,
+                    status=self._calculate_status(ventilators, ventilators_total),
+                    hours_remaining=None
+                ),
+                ResourceStatus(
+                    resource_type="blood_units",
+                    current_level=blood_units,
+                    capacity=200,
+                    status=self._calculate_status(blood_units, 200),
+                    hours_remaining=None
+                ),
+            ]
+            await self._cache_resource_status(resources)
+            return resources
+        finally:
+            if locked:
+                await redis_client.release_lock(RESOURCE_LOCK_KEY, token)
+    
+    @staticmethod
+    async def _cache_resource_status(resources: List[ResourceStatus]):
+        await redis_client.cache_json(
+            RESOURCE_CACHE_KEY, _RESOURCE_LIST_ADAPTER.dump_python(resources, mode="json"), ex=RESOURCE_CACHE_TTL_SECONDS
+        )
     
-    def _calculate_status(self, current: float, capacity: float) -> str:
+    @staticmethod
+    def _calculate_status(current: float, capacity: float) -> str:
         """Calculate resource status"""
         if capacity == 0:
             return "critical"
@@ -244,7 +491,16 @@ Provide your strategic recommendations in this JSON format:
             return "low"
         return "adequate"
     
-    def _get_hospital_status(self) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _format_hospitals(hospitals: Sequence[Hospital]) -> str:
+        """Format hospital status for the strategy prompt"""
+        return "\n".join([
+            f"- {h.name}: {h.capacity.available_beds} beds available, "
+            f"{h.distance_km}km away, specialties: {', '.join(h.specialties)}"
+            for h in hospitals
+        ])
+    
+    def _get_hospital_status(self) -> Sequence[Hospital]:
         """Get nearby hospital status"""
         # In production, this would query each hospital's system
         return NEARBY_HOSPITALS
@@ -253,73 +509,118 @@ Provide your strategic recommendations in this JSON format:
         self, 
         incident: IncidentReport, 
         resources: List[ResourceStatus],
-        hospitals: List[Dict[str, Any]]
+        hospitals: Sequence[Hospital],
+        on_field: Optional[Callable[[str, Any], None]] = None
     ) -> Dict[str, Any]:
-        """Get AI strategic recommendations"""
-        try:
-            # Format resource status
-            resource_str = "\n".join([
-                f"- {r.resource_type}: {r.current_level}/{r.capacity} ({r.status})"
-                + (f" - {r.hours_remaining:.1f}h remaining" if r.hours_remaining else "")
-                for r in resources
-            ])
-            
-            # Format hospital status
-            hospital_str = "\n".join([
-                f"- {h['name']}: {h['capacity']['available_beds']} beds available, "
-                f"{h['distance_km']}km away, specialties: {', '.join(h['specialties'])}"
-                for h in hospitals
-            ])
-            
-            formatted = self.strategy_prompt.format_messages(
-                incident_type=incident.type.value,
-                severity=incident.severity.value,
-                location=incident.location.address,
-                distance=incident.location.distance_from_hospital,
-                casualties=incident.estimated_casualties.likely,
-                min_casualties=incident.estimated_casualties.min,
-                max_casualties=incident.estimated_casualties.max,
-                injury_types=", ".join(incident.injury_types),
-                eta=incident.eta_minutes,
-                resource_status=resource_str,
-                hospital_status=hospital_str
-            )
-            
-            response = await self.llm.ainvoke(formatted)
-            return self._parse_strategy(response.content)
-            
-        except Exception as e:
-            print(f"Error getting AI strategy: {e}")
-            return self._get_fallback_strategy(incident, resources)
+        """
+        Get AI strategic recommendations
+        
+        The completion is streamed; on_field is called with each array in
+        STREAMED_STRATEGY_FIELDS as soon as it is complete.
+        """
+        cache_key = self._strategy_cache_key(incident, resources, hospitals)
+        cached = await redis_client.get_json(cache_key)
+        if cached:
+            return cached
+        
+        # Format resource status
+        resource_str = "\n".join([
+            f"- {r.resource_type}: {r.current_level}/{r.capacity} ({r.status})"
+            + (f" - {r.hours_remaining:.1f}h remaining" if r.hours_remaining else "")
+            for r in resources
+        ])
+        
+        # Format hospital status (static network is formatted once in __init__)
+        if hospitals is NEARBY_HOSPITALS:
+            hospital_str = self._hospital_str_cached
+        else:
+            hospital_str = self._format_hospitals(hospitals)
+        
+        human = self._human_fmt.format(
+            incident_type=incident.type.value,
+            severity=incident.severity.value,
+            location=incident.location.address,
+            distance=incident.location.distance_from_hospital,
+            casualties=incident.estimated_casualties.likely,
+            min_casualties=incident.estimated_casualties.min,
+            max_casualties=incident.estimated_casualties.max,
+            injury_types=", ".join(incident.injury_types),
+            eta=incident.eta_minutes,
+            resource_status=resource_str,
+            hospital_status=hospital_str
+        )
+        formatted = [self._system_msg, HumanMessage(content=human)]
+        
+        parser = StrategyStreamParser(STREAMED_STRATEGY_FIELDS)
+        parts: List[str] = []
+        async with aclosing(self.llm.astream(formatted)) as stream:
+            while True:
+                # Only the LLM stream itself falls back; parsing and on_field run outside the try
+                try:
+                    chunk = await anext(stream)
+                except StopAsyncIteration:
+                    break
+                except Exception as e:
+                    logger.warning("Error getting AI strategy: %s", e)
+                    return self._get_fallback_strategy(incident, resources)
+                parts.append(chunk.content)
+                for key, value in parser.feed(chunk.content):
+                    if on_field:
+                        on_field(key, value)
+        
+        strategy = self._parse_strategy("".join(parts))
+        
+        # Only cache complete plans, not the parse fallback
+        if strategy.get("overall_assessment"):
+            await redis_client.cache_json(cache_key, strategy, ex=STRATEGY_CACHE_TTL_SECONDS)
+        return strategy
+    
+    def _strategy_cache_key(
+        self,
+        incident: IncidentReport,
+        resources: List[ResourceStatus],
+        hospitals: Sequence[Hospital]
+    ) -> str:
+        """
+        Cache key from quantized incident features, so near-identical
+        situations (same type, severity, casualty/ETA bucket and resource
+        picture) share a strategy
+        """
+        signature = "|".join([
+            incident.type.value,
+            incident.severity.value,
+            str(bisect_right(CASUALTY_BUCKETS, incident.estimated_casualties.likely)),
+            str(incident.eta_minutes // 10),
+            ",".join(f"{r.resource_type}:{r.status}" for r in resources),
+            str(sum(h.capacity.available_beds for h in hospitals) // 25)
+        ])
+        return f"strategy:{hashlib.blake2b(signature.encode(), digest_size=16).hexdigest()}"
     
     def _parse_strategy(self, content: str) -> Dict[str, Any]:
         """Parse AI strategy response"""
-        import json
+        fallback = {"capacity_score": 0.5, "resource_priorities": [], "hospital_coordination": [], "vendor_orders": []}
+        
+        start = content.find("{")
+        end = content.rfind("}") + 1
+        if start < 0 or end <= start:
+            return fallback
+        
         try:
-            start = content.find("{")
-            end = content.rfind("}") + 1
-            if start >= 0 and end > start:
-                return json.loads(content[start:end])
-        except:
-            pass
-        return {"capacity_score": 0.5, "resource_priorities": [], "hospital_coordination": [], "vendor_orders": []}
+            strategy = orjson.loads(content[start:end].encode())
+        except orjson.JSONDecodeError:
+            return fallback
+        return strategy if isinstance(strategy, dict) else fallback
     
     def _get_fallback_strategy(self, incident: IncidentReport, resources: List[ResourceStatus]) -> Dict[str, Any]:
         """Generate fallback strategy without AI"""
         capacity_score = 0.7
         
         # Reduce score based on severity
-        if incident.severity == SeverityLevel.CRITICAL:
-            capacity_score -= 0.3
-        elif incident.severity == SeverityLevel.HIGH:
-            capacity_score -= 0.2
+        capacity_score -= SEVERITY_PENALTIES.get(incident.severity, 0.0)
         
         # Reduce score based on resource status
         for r in resources:
-            if r.status == "critical":
-                capacity_score -= 0.15
-            elif r.status == "low":
-                capacity_score -= 0.08
+            capacity_score -= STATUS_PENALTIES.get(r.status, 0.0)
         
         return {
             "overall_assessment": f"Incoming {incident.severity.value} {incident.type.value} incident",
@@ -331,67 +632,85 @@ Provide your strategic recommendations in this JSON format:
             "contingency_plans": ["Activate mutual aid agreements", "Prepare for ambulance diversion"]
         }
     
-    def _generate_resource_requests(self, incident: IncidentReport, strategy: Dict) -> List[ResourceRequest]:
+    def _find_vendor(self, vendor_type: str) -> Optional[Vendor]:
+        """First vendor whose resource type contains vendor_type"""
+        vendor = self._vendors_by_resource.get(vendor_type)
+        if vendor is None:
+            # Partial names ("med" for "medications") need the substring scan
+            vendor = next((v for v in VENDORS if vendor_type in v.resource_type), None)
+        return vendor
+    
+    def _find_hospital(self, name_lower: str) -> Optional[Hospital]:
+        """First nearby hospital whose name contains name_lower"""
+        hospital = self._hospital_by_name_lower.get(name_lower)
+        if hospital is None:
+            hospital = next((h for lower, h in self._hospitals_by_name_lower if name_lower in lower), None)
+        return hospital
+    
+    def _generate_resource_requests(
+        self, incident: IncidentReport, strategy: Dict, now: datetime, new_id: Callable[[], str]
+    ) -> List[ResourceRequest]:
         """Generate resource requests for vendors"""
         requests = []
         
         for order in strategy.get("vendor_orders", []):
             vendor_type = order.get("vendor_type", "").lower()
-            matching_vendors = [v for v in VENDORS if vendor_type in v["resource_type"]]
+            vendor = self._find_vendor(vendor_type)
             
-            if matching_vendors:
-                vendor = matching_vendors[0]
+            if vendor:
                 requests.append(ResourceRequest(
-                    id=str(uuid.uuid4()),
+                    id=new_id(),
                     resource_type=vendor_type,
                     quantity=1,  # Would parse from order["quantity"]
                     urgency=SeverityLevel(order.get("urgency", "high")),
-                    vendor_id=vendor["id"],
-                    vendor_name=vendor["name"],
-                    estimated_arrival_minutes=vendor["response_time_minutes"],
+                    vendor_id=vendor.id,
+                    vendor_name=vendor.name,
+                    estimated_arrival_minutes=vendor.response_time_minutes,
                     status="pending",
-                    requested_at=datetime.now()
+                    requested_at=now
                 ))
         
         return requests
     
-    def _generate_hospital_alerts(self, incident: IncidentReport, strategy: Dict) -> List[HospitalAlert]:
+    def _generate_hospital_alerts(
+        self, incident: IncidentReport, strategy: Dict, now: datetime, new_id: Callable[[], str]
+    ) -> List[HospitalAlert]:
         """Generate alerts for nearby hospitals"""
         alerts = []
         
         for coord in strategy.get("hospital_coordination", []):
             hospital_name = coord.get("hospital", "")
-            matching = [h for h in NEARBY_HOSPITALS if hospital_name.lower() in h["name"].lower()]
+            hospital = self._find_hospital(hospital_name.lower())
             
-            if matching:
-                hospital = matching[0]
+            if hospital:
                 action = coord.get("action", "alert")
                 
                 alerts.append(HospitalAlert(
-                    id=str(uuid.uuid4()),
-                    hospital_id=hospital["id"],
-                    hospital_name=hospital["name"],
+                    id=new_id(),
+                    hospital_id=hospital.id,
+                    hospital_name=hospital.name,
                     alert_type=action,
                     incident_id=incident.id,
                     message=f"{incident.type.value.upper()} incident. {coord.get('reason', 'Requesting coordination.')}",
                     expected_patients=coord.get("patients_to_send", 0),
-                    sent_at=datetime.now(),
+                    sent_at=now,
                     acknowledged=False
                 ))
         
         # Always alert nearest hospitals for high/critical incidents
-        if incident.severity in [SeverityLevel.CRITICAL, SeverityLevel.HIGH]:
-            for hospital in NEARBY_HOSPITALS[:3]:  # Top 3 nearest
-                if not any(a.hospital_id == hospital["id"] for a in alerts):
+        if incident.severity in _ALERT_SEVERITIES:
+            alerted = {a.hospital_id for a in alerts}
+            for hospital in NEAREST_HOSPITALS:
+                if hospital.id not in alerted:
                     alerts.append(HospitalAlert(
-                        id=str(uuid.uuid4()),
-                        hospital_id=hospital["id"],
-                        hospital_name=hospital["name"],
+                        id=new_id(),
+                        hospital_id=hospital.id,
+                        hospital_name=hospital.name,
                         alert_type="awareness",
                         incident_id=incident.id,
                         message=f"ALERT: {incident.severity.value.upper()} {incident.type.value} incident {incident.location.distance_from_hospital}km away. Est. {incident.estimated_casualties.likely} casualties.",
                         expected_patients=incident.estimated_casualties.likely // 3,
-                        sent_at=datetime.now(),
+                        sent_at=now,
                         acknowledged=False
                     ))
         
@@ -5,15 +5,20 @@ Uses Tavily API for real-time incident detection and LangChain with Groq for ana
 
 import asyncio
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from functools import lru_cache
+import hashlib
+import logging
+import re
+from typing import List, Optional, Dict, Any, Tuple
 import uuid
 import math
 
+import httpx
+import orjson
 from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
-from tavily import TavilyClient
 
-from config import get_settings, INCIDENT_CONFIGS
+from config import get_settings, DELHI_LOCATIONS
 from redis_client import redis_client
 from models import (
     IncidentReport, IncidentType, SeverityLevel, 
@@ -21,6 +26,97 @@ from models import (
 )
 
 
+logger = logging.getLogger(__name__)
+
+# Tavily REST endpoint and limits for searches during a scan
+TAVILY_API_URL = "https://api.tavily.com"
+TAVILY_TIMEOUT_SECONDS = 30.0
+MAX_CONCURRENT_SEARCHES = 8
+
+# Search results packed into one LLM analysis call
+ANALYSIS_BATCH_SIZE = 5
+
+# One article in a batched analysis prompt
+_BATCH_ARTICLE_FMT = """Incident {index}:
+Title: {title}
+Description: {content}
+Source: {source}
+Location mentioned: {location}
+Published: {published}"""
+
+# Severities surfaced by a scan, and their sort order (most severe first)
+_REPORTED_SEVERITIES = frozenset({SeverityLevel.CRITICAL, SeverityLevel.HIGH, SeverityLevel.MEDIUM})
+_SEVERITY_RANK = {
+    SeverityLevel.CRITICAL: 0,
+    SeverityLevel.HIGH: 1,
+    SeverityLevel.MEDIUM: 2,
+    SeverityLevel.LOW: 3
+}
+
+# Pre-LLM relevance filter for Tavily results
+MIN_RESULT_SCORE = 0.4
+_EMERGENCY_KEYWORDS = re.compile(
+    r"\b(fire|blaze|accident|collapse|leak|blast|stampede|explosion|crash|derail|flood"
+    r"|crush|attack|terror|outbreak|epidemic|hazmat|chemical|injur|dead|death|kill|casualt|emergency)",
+    re.IGNORECASE
+)
+
+# How long a cached LLM analysis of an article stays valid
+ANALYSIS_CACHE_TTL_SECONDS = 3600
+
+# Kilometres per degree of latitude
+KM_PER_DEGREE = 111.32
+
+# Known localities compiled into a single alternation, matched against lower-cased text
+_LOCATIONS_BY_LOWER = {loc.lower(): loc for loc in DELHI_LOCATIONS}
+_LOCATION_RANK = {lower: rank for rank, lower in enumerate(_LOCATIONS_BY_LOWER)}
+_LOCATION_PATTERN = re.compile("|".join(re.escape(lower) for lower in _LOCATIONS_BY_LOWER))
+
+
+# Tavily query templates per incident family, formatted with the search area
+_SEARCH_QUERY_TEMPLATES = (
+    ("fire accident emergency {location} today", "news"),
+    ("road accident injury {location} breaking", "news"),
+    ("building collapse emergency {location}", "news"),
+    ("chemical leak gas hazmat {location}", "news"),
+    ("stampede crowd crush {location}", "news"),
+    ("explosion blast attack {location}", "news"),
+    ("train metro accident {location} today", "news"),
+    ("hospital emergency mass casualty {location}", "emergency"),
+)
+
+
+@lru_cache(maxsize=64)
+def _build_queries_cached(
+    location_address: Optional[str],
+    include_sources: Optional[Tuple[str, ...]]
+) -> Tuple[Dict[str, str], ...]:
+    """Search queries for an area and source filter (shared between scans; do not mutate)"""
+    location = "Delhi NCR" if location_address is None else f"near {location_address}"
+    return tuple(
+        {"query": template.format(location=location), "source": source}
+        for template, source in _SEARCH_QUERY_TEMPLATES
+        # Filter by requested sources
+        if not include_sources or source in include_sources
+    )
+
+
+# Jaccard similarity above which two incidents are treated as the same story
+DEDUP_SIMILARITY_THRESHOLD = 0.7
+
+
+def _shingles(text: str, n: int = 3) -> frozenset:
+    """Character n-grams of whitespace-normalized, lower-cased text"""
+    normalized = " ".join(text.lower().split())
+    return frozenset(normalized[i:i + n] for i in range(max(len(normalized) - n + 1, 1)))
+
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
 class EmergencyScannerAgent:
     """
     AI Agent for scanning and detecting emergency incidents
@@ -29,16 +125,35 @@ class EmergencyScannerAgent:
     
     def __init__(self):
         self.settings = get_settings()
-        self.tavily = TavilyClient(api_key=self.settings.tavily_api_key)
+        # Plain attributes for the hospital fields read on every analysis
+        self._hospital_name = self.settings.hospital_name
+        self._hospital_lat = float(self.settings.hospital_lat)
+        self._hospital_lng = float(self.settings.hospital_lng)
+        # Degrees per km along a north-east bearing (longitude degrees shrink by cos(lat))
+        self._lat_per_km = math.sqrt(0.5) / KM_PER_DEGREE
+        self._lng_per_km = math.sqrt(0.5) / (KM_PER_DEGREE * math.cos(math.radians(self._hospital_lat)))
+        # Km per longitude degree at the hospital, for distances to known localities
+        self._km_per_lng = KM_PER_DEGREE * math.cos(math.radians(self._hospital_lat))
+        # Clients are only needed for live scans; scan_demo works without credentials
+        # Tavily is called over its REST API on a pooled async client (keep-alive across scans)
+        self.tavily = httpx.AsyncClient(
+            base_url=TAVILY_API_URL,
+            headers={"Authorization": f"Bearer {self.settings.tavily_api_key}"},
+            timeout=TAVILY_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=MAX_CONCURRENT_SEARCHES, max_keepalive_connections=MAX_CONCURRENT_SEARCHES)
+        ) if self.settings.tavily_api_key else None
         self.llm = ChatGroq(
             api_key=self.settings.groq_api_key,
             model_name="llama-3.3-70b-versatile",
             temperature=0.1  # Low temperature for factual analysis
-        )
+        ) if self.settings.groq_api_key else None
+        
+        # Cap concurrent calls from the scan fan-out to stay within rate limits
+        self._search_semaphore = asyncio.Semaphore(MAX_CONCURRENT_SEARCHES)
+        self._llm_semaphore = asyncio.Semaphore(self.settings.groq_max_concurrency)
         
         # Analysis prompt
-        self.analysis_prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are an Emergency Intelligence Analyst for a hospital system.
+        system_prompt = """You are an Emergency Intelligence Analyst for a hospital system.
 Your job is to analyze incident reports and extract critical information for emergency preparedness.
 
 Hospital Location: {hospital_name} ({hospital_lat}, {hospital_lng})
@@ -53,17 +168,8 @@ Analyze the following incident data and provide:
 6. Estimated time of arrival for first patients
 
 Be precise and err on the side of caution for public safety.
-If information is unclear, state your assumptions."""),
-            ("human", """Analyze this incident:
-
-Title: {title}
-Description: {content}
-Source: {source}
-Location mentioned: {location}
-Published: {published}
-
-Provide your analysis in this exact JSON format:
-{{
+If information is unclear, state your assumptions."""
+        json_format = """{{
     "incident_type": "fire|road_accident|building_collapse|chemical_spill|gas_leak|stampede|terror_attack|train_accident|flood|epidemic_outbreak|unknown",
     "severity": "critical|high|medium|low",
     "location_extracted": "specific location or area name",
@@ -78,65 +184,116 @@ Provide your analysis in this exact JSON format:
     "departments_needed": ["list", "of", "departments"],
     "eta_minutes": <number>,
     "analysis_notes": "brief explanation of your assessment"
-}}""")
-        ])
+}}"""
+        # Hospital details are fixed for the agent's lifetime; bind them once
+        hospital = dict(
+            hospital_name=self.settings.hospital_name,
+            hospital_lat=self.settings.hospital_lat,
+            hospital_lng=self.settings.hospital_lng,
+            scan_radius=self.settings.scan_radius_km
+        )
+        self.analysis_prompt = ChatPromptTemplate.from_messages([
+            ("system", system_prompt),
+            ("human", """Analyze this incident:
+
+Title: {title}
+Description: {content}
+Source: {source}
+Location mentioned: {location}
+Published: {published}
+
+Provide your analysis in this exact JSON format:
+""" + json_format)
+        ]).partial(**hospital)
+        
+        # Several articles per call, so the system prompt and schema are sent once per batch
+        self.batch_analysis_prompt = ChatPromptTemplate.from_messages([
+            ("system", system_prompt),
+            ("human", """Analyze each of these {count} incidents:
+
+{incidents}
+
+Respond with a JSON array of exactly {count} objects, one per incident and in the same order, each in this exact format:
+""" + json_format)
+        ]).partial(**hospital)
     
     async def scan(self, request: ScanRequest) -> ScanResponse:
         """
         Scan for emergency incidents using Tavily API
         """
+        if self.tavily is None or self.llm is None:
+            raise RuntimeError("Live scanning needs TAVILY_API_KEY and GROQ_API_KEY; use scan_demo() without them")
+        
         incidents: List[IncidentReport] = []
-        sources_checked = []
         
         # Build search queries for different incident types
         search_queries = self._build_search_queries(request)
+        sources_checked = [query_info["source"] for query_info in search_queries]
         
-        for query_info in search_queries:
-            try:
-                sources_checked.append(query_info["source"])
-                
-                # Check Cache
-                cache_key = f"scan_query:{query_info['query']}"
-                cached_results = redis_client.get_json(cache_key)
-                
-                if cached_results:
-                    results = cached_results
-                else:
-                    results = await self._search_tavily(query_info["query"])
-                    redis_client.cache_json(cache_key, results, ex=300)
-                
-                for result in results:
-                    # Deduplication
-                    content_hash = str(hash(result.get('content', '') + result.get('url', '')))
-                    dedup_key = f"processed_incident:{content_hash}"
-                    
-                    if redis_client.exists(dedup_key):
-                        continue
-
-                    # Analyze each result with AI
-                    incident = await self._analyze_incident(result, query_info["source"])
-                    
-                    if incident:
-                        redis_client.set(dedup_key, "processed", ex=86400)
-                    if incident and incident.severity in [SeverityLevel.CRITICAL, SeverityLevel.HIGH, SeverityLevel.MEDIUM]:
-                        # Filter by distance
-                        if incident.location.distance_from_hospital and incident.location.distance_from_hospital <= (request.radius_km or 15):
-                            incidents.append(incident)
-                            
-            except Exception as e:
-                print(f"Error scanning {query_info['source']}: {e}")
+        # Phase 1: run every search concurrently, with cached results fetched in one MGET
+        cached_lists = await redis_client.get_packed_many(
+            [f"scan_query:{query_info['query']}" for query_info in search_queries]
+        )
+        results_lists = await asyncio.gather(
+            *[
+                self._search_with_cache(query_info["query"], cached_results)
+                for query_info, cached_results in zip(search_queries, cached_lists)
+            ],
+            return_exceptions=True
+        )
+        
+        candidates = {}
+        for query_info, results in zip(search_queries, results_lists):
+            if isinstance(results, Exception):
+                logger.warning("Error scanning %s: %s", query_info["source"], results)
                 continue
+            
+            for result in results:
+                # Skip low-relevance hits before they cost an LLM call
+                if not self._prefilter(result):
+                    continue
+                
+                # Deduplication on a stable digest of the article URL
+                dedup_source = result.get('url') or result.get('content', '')
+                dedup_key = "processed_incident:" + hashlib.blake2b(
+                    dedup_source.encode(), digest_size=16
+                ).hexdigest()
+                candidates.setdefault(dedup_key, (result, query_info["source"]))
+        
+        # Drop results already processed by earlier scans in one round-trip
+        dedup_keys = list(candidates)
+        seen = await redis_client.get_many(dedup_keys)
+        pending = [(key, *candidates[key]) for key, hit in zip(dedup_keys, seen) if hit is None]
+        
+        # Phase 2: analyze new results with AI, several per call and batches concurrently
+        batches = [pending[i:i + ANALYSIS_BATCH_SIZE] for i in range(0, len(pending), ANALYSIS_BATCH_SIZE)]
+        batch_results = await asyncio.gather(
+            *[self._analyze_batch([(result, source) for _, result, source in batch]) for batch in batches]
+        )
+        analyzed = [incident for batch in batch_results for incident in batch]
+        
+        await redis_client.set_many_ex(
+            {dedup_key: "processed" for (dedup_key, _, _), incident in zip(pending, analyzed) if incident},
+            ex=86400
+        )
+        
+        for incident in analyzed:
+            if incident and incident.severity in _REPORTED_SEVERITIES:
+                # Filter by distance
+                if incident.location.distance_from_hospital and incident.location.distance_from_hospital <= (request.radius_km or 15):
+                    incidents.append(incident)
         
         # Deduplicate incidents by similarity
         incidents = self._deduplicate_incidents(incidents)
         
         # Sort by severity and distance
         incidents.sort(key=lambda x: (
-            {"critical": 0, "high": 1, "medium": 2, "low": 3}[x.severity.value],
+            _SEVERITY_RANK[x.severity],
             x.location.distance_from_hospital or 999
         ))
         
-        return ScanResponse(
+        # Incidents are already validated IncidentReports; skip re-validating the wrapper
+        return ScanResponse.model_construct(
             success=True,
             incidents=incidents[:10],  # Return top 10
             scan_time=datetime.now(),
@@ -144,64 +301,136 @@ Provide your analysis in this exact JSON format:
             message=f"Found {len(incidents)} potential incidents"
         )
     
-    def _build_search_queries(self, request: ScanRequest) -> List[Dict[str, str]]:
+    def _build_search_queries(self, request: ScanRequest) -> Tuple[Dict[str, str], ...]:
         """Build search queries for Tavily"""
-        location = f"Delhi NCR" if not request.location else f"near {request.location.address}"
-        
-        queries = [
-            {"query": f"fire accident emergency {location} today", "source": "news"},
-            {"query": f"road accident injury {location} breaking", "source": "news"},
-            {"query": f"building collapse emergency {location}", "source": "news"},
-            {"query": f"chemical leak gas hazmat {location}", "source": "news"},
-            {"query": f"stampede crowd crush {location}", "source": "news"},
-            {"query": f"explosion blast attack {location}", "source": "news"},
-            {"query": f"train metro accident {location} today", "source": "news"},
-            {"query": f"hospital emergency mass casualty {location}", "source": "emergency"},
-        ]
-        
-        # Filter by requested sources
-        if request.include_sources:
-            queries = [q for q in queries if q["source"] in request.include_sources]
+        return _build_queries_cached(
+            request.location.address if request.location else None,
+            tuple(request.include_sources) if request.include_sources else None
+        )
+    
+    async def _search_with_cache(
+        self,
+        query: str,
+        cached_results: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Dict[str, Any]]:
+        """Search Tavily unless results for the query are already cached in Redis"""
+        if cached_results:
+            return cached_results
         
-        return queries
+        results = await self._search_tavily(query)
+        await redis_client.cache_packed(f"scan_query:{query}", results, ex=300)
+        return results
     
     async def _search_tavily(self, query: str) -> List[Dict[str, Any]]:
         """Search using Tavily API"""
         try:
-            response = self.tavily.search(
-                query=query,
-                search_depth="advanced",
-                max_results=5,
-                include_answer=True,
-                include_raw_content=True,
-                include_images=False,
-                # Focus on recent news
-                topic="news"
-            )
-            return response.get("results", [])
+            async with self._search_semaphore:
+                response = await self.tavily.post("/search", json={
+                    "query": query,
+                    "search_depth": "advanced",
+                    "max_results": 5,
+                    "include_answer": True,
+                    "include_raw_content": True,
+                    "include_images": False,
+                    # Focus on recent news
+                    "topic": "news"
+                })
+            response.raise_for_status()
+            return orjson.loads(response.content).get("results", [])
         except Exception as e:
-            print(f"Tavily search error: {e}")
+            logger.warning("Tavily search error: %s", e)
             return []
     
-    async def _analyze_incident(self, result: Dict[str, Any], source: str) -> Optional[IncidentReport]:
-        """Analyze a search result using Gemini AI"""
+    async def aclose(self):
+        """Close the pooled Tavily connections"""
+        if self.tavily is not None:
+            await self.tavily.aclose()
+    
+    def _article_fields(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Per-article prompt fields"""
+        return dict(
+            title=result.get("title") or "Unknown",
+            content=(result.get("content") or result.get("raw_content") or "")[:2000],
+            source=result.get("url", "Unknown"),
+            location=self._extract_location_hint(result),
+            published=result.get("published_date", "Unknown")
+        )
+    
+    async def _analyze_batch(self, batch: List[Tuple[Dict[str, Any], str]]) -> List[Optional[IncidentReport]]:
+        """Analyze (result, source) pairs with one LLM call, falling back to one call per result"""
+        cache_keys = [self._analysis_cache_key(result) for result, _ in batch]
+        analyses = [
+            cached if isinstance(cached, dict) else None
+            for cached in await redis_client.get_json_many(cache_keys)
+        ]
+        misses = [i for i, analysis in enumerate(analyses) if analysis is None]
+        
+        if len(misses) > 1:
+            batch_analyses = await self._analyze_many([batch[i][0] for i in misses])
+            if batch_analyses:
+                found = {}
+                for i, analysis in zip(misses, batch_analyses):
+                    if analysis is not None:
+                        analyses[i] = analysis
+                        found[cache_keys[i]] = orjson.dumps(analysis)
+                await redis_client.set_many_ex(found, ex=ANALYSIS_CACHE_TTL_SECONDS)
+        
+        return list(await asyncio.gather(*[
+            self._analyze_incident(result, source, cache_key, analysis)
+            for (result, source), cache_key, analysis in zip(batch, cache_keys, analyses)
+        ]))
+    
+    async def _analyze_many(self, results: List[Dict[str, Any]]) -> Optional[List[Optional[Dict[str, Any]]]]:
+        """
+        One LLM call for several results; per-result analysis (None where the
+        model returned something other than an object), or None if unusable
+        """
+        articles = "\n\n".join(
+            _BATCH_ARTICLE_FMT.format(index=n, **self._article_fields(result))
+            for n, result in enumerate(results, 1)
+        )
         try:
-            # Format the prompt
-            formatted_prompt = self.analysis_prompt.format_messages(
-                hospital_name=self.settings.hospital_name,
-                hospital_lat=self.settings.hospital_lat,
-                hospital_lng=self.settings.hospital_lng,
-                scan_radius=self.settings.scan_radius_km,
-                title=result.get("title", "Unknown"),
-                content=result.get("content", result.get("raw_content", ""))[:2000],
-                source=result.get("url", "Unknown"),
-                location=self._extract_location_hint(result),
-                published=result.get("published_date", "Unknown")
-            )
-            
-            # Get AI analysis
-            response = await self.llm.ainvoke(formatted_prompt)
-            analysis = self._parse_analysis(response.content)
+            formatted_prompt = self.batch_analysis_prompt.format_messages(count=len(results), incidents=articles)
+            async with self._llm_semaphore:
+                response = await self.llm.ainvoke(formatted_prompt)
+        except Exception as e:
+            logger.warning("Error analyzing incident batch: %s", e)
+            return None
+        
+        content = response.content
+        start = content.find("[")
+        end = content.rfind("]") + 1
+        if start < 0 or end <= start:
+            return None
+        try:
+            analyses = orjson.loads(content[start:end].encode())
+        except orjson.JSONDecodeError:
+            return None
+        if not isinstance(analyses, list) or len(analyses) != len(results):
+            return None
+        return [analysis if isinstance(analysis, dict) else None for analysis in analyses]
+    
+    async def _analyze_incident(
+        self,
+        result: Dict[str, Any],
+        source: str,
+        cache_key: str,
+        analysis: Optional[Dict[str, Any]] = None
+    ) -> Optional[IncidentReport]:
+        """
+        Turn a search result into an incident report. analysis is the cached or
+        batched analysis; None means cache_key is a known miss, so the result is
+        analyzed on its own with Gemini AI
+        """
+        try:
+            if analysis is None:
+                formatted_prompt = self.analysis_prompt.format_messages(**self._article_fields(result))
+                async with self._llm_semaphore:
+                    response = await self.llm.ainvoke(formatted_prompt)
+                analysis = self._parse_analysis(response.content)
+                # Only a usable analysis is cached; a malformed reply is retried next scan
+                if analysis:
+                    await redis_client.cache_json(cache_key, analysis, ex=ANALYSIS_CACHE_TTL_SECONDS)
             
             if not analysis:
                 return None
@@ -212,6 +441,19 @@ Provide your analysis in this exact JSON format:
             except (ValueError, TypeError):
                 distance = 10.0
             
+            # Known locality coordinates; otherwise offset from the hospital by the estimated distance
+            coords = DELHI_LOCATIONS.get(self._extract_location_hint(result))
+            if coords:
+                lat, lng = coords
+                # Report (and radius-filter on) the distance to where the incident is plotted
+                distance = round(math.hypot(
+                    (lat - self._hospital_lat) * KM_PER_DEGREE,
+                    (lng - self._hospital_lng) * self._km_per_lng,
+                ), 1)
+            else:
+                lat = self._hospital_lat + distance * self._lat_per_km
+                lng = self._hospital_lng + distance * self._lng_per_km
+            
             # Safely extract casualty estimates
             casualty_est = analysis.get("casualty_estimate", {})
             try:
@@ -225,13 +467,13 @@ Provide your analysis in this exact JSON format:
             # Create incident report
             incident = IncidentReport(
                 id=str(uuid.uuid4()),
-                title=result.get("title", "Unknown Incident"),
-                description=result.get("content", "")[:500],
+                title=result.get("title") or "Unknown Incident",
+                description=(result.get("content") or "")[:500],
                 type=IncidentType(analysis.get("incident_type", "unknown")),
                 severity=SeverityLevel(analysis.get("severity", "medium")),
                 location=Location(
-                    lat=self.settings.hospital_lat + (distance * 0.009),  # Approximate
-                    lng=self.settings.hospital_lng + (distance * 0.009),
+                    lat=lat,
+                    lng=lng,
                     address=analysis.get("location_extracted", "Unknown location"),
                     distance_from_hospital=distance
                 ),
@@ -248,59 +490,78 @@ Provide your analysis in this exact JSON format:
                 source_url=result.get("url"),
                 detected_at=datetime.now(),
                 confidence_score=cas_confidence,
-                raw_data=result,
+                # Only the search metadata; the text already lives in description/source_url
+                raw_data={"published_date": result.get("published_date"), "score": result.get("score")},
                 ai_analysis=analysis.get("analysis_notes", "")
             )
             
             return incident
             
         except Exception as e:
-            print(f"Error analyzing incident: {e}")
+            logger.warning("Error analyzing incident: %s", e)
             return None
     
+    def _prefilter(self, result: Dict[str, Any]) -> bool:
+        """Cheap relevance check: a decent Tavily score and an emergency keyword"""
+        # Tavily can send null fields; a missing score is not a low one
+        score = result.get("score")
+        if score is not None and score < MIN_RESULT_SCORE:
+            return False
+        text = (result.get("title") or "") + " " + (result.get("content") or "")[:500]
+        return _EMERGENCY_KEYWORDS.search(text) is not None
+    
+    def _analysis_cache_key(self, result: Dict[str, Any]) -> str:
+        """Cache key for an LLM analysis, scoped to this hospital and keyed on the article text"""
+        text = f"{result.get('title') or ''} {(result.get('content') or result.get('raw_content') or '')[:2000]}"
+        normalized = " ".join(text.lower().split())
+        digest = hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+        return f"incident_analysis:{self._hospital_name}:{digest}"
+    
     def _extract_location_hint(self, result: Dict[str, Any]) -> str:
         """Extract location hints from result"""
-        text = result.get("title", "") + " " + result.get("content", "")[:500]
+        text = ((result.get("title") or "") + " " + (result.get("content") or "")[:500]).lower()
         
-        # Common Delhi locations to look for
-        locations = [
-            "Connaught Place", "Karol Bagh", "Chandni Chowk", "Dwarka",
-            "Rohini", "Pitampura", "Janakpuri", "Saket", "Nehru Place",
-            "Lajpat Nagar", "Greater Kailash", "Hauz Khas", "Vasant Kunj",
-            "Noida", "Gurgaon", "Faridabad", "Ghaziabad"
-        ]
-        
-        for loc in locations:
-            if loc.lower() in text.lower():
-                return loc
+        # One pass over the text; earlier entries in DELHI_LOCATIONS win
+        matches = {match.group() for match in _LOCATION_PATTERN.finditer(text)}
+        if matches:
+            return _LOCATIONS_BY_LOWER[min(matches, key=_LOCATION_RANK.__getitem__)]
         
         return "Delhi NCR Region"
     
     def _parse_analysis(self, content: str) -> Optional[Dict[str, Any]]:
         """Parse AI analysis response"""
-        import json
+        # Extract JSON from response
+        start = content.find("{")
+        end = content.rfind("}") + 1
+        if start < 0 or end <= start:
+            return None
+        
         try:
-            # Extract JSON from response
-            start = content.find("{")
-            end = content.rfind("}") + 1
-            if start >= 0 and end > start:
-                json_str = content[start:end]
-                return json.loads(json_str)
-        except:
-            pass
-        return None
+            analysis = orjson.loads(content[start:end].encode())
+        except orjson.JSONDecodeError:
+            return None
+        return analysis if isinstance(analysis, dict) else None
     
     def _deduplicate_incidents(self, incidents: List[IncidentReport]) -> List[IncidentReport]:
         """Remove duplicate incidents based on similarity"""
         unique = []
         seen_titles = set()
+        seen_shingles: List[frozenset] = []
         
         for incident in incidents:
-            # Simple title-based dedup
+            # Exact title match catches verbatim reposts cheaply
             title_key = incident.title.lower()[:50]
-            if title_key not in seen_titles:
-                seen_titles.add(title_key)
-                unique.append(incident)
+            if title_key in seen_titles:
+                continue
+            
+            # Near-duplicates: character 3-gram Jaccard over title + description
+            shingles = _shingles(f"{incident.title} {incident.description[:200]}")
+            if any(_jaccard(shingles, other) >= DEDUP_SIMILARITY_THRESHOLD for other in seen_shingles):
+                continue
+            
+            seen_titles.add(title_key)
+            seen_shingles.append(shingles)
+            unique.append(incident)
         
         return unique
     
@@ -377,7 +638,7 @@ Provide your analysis in this exact JSON format:
             )
         ]
         
-        return ScanResponse(
+        return ScanResponse.model_construct(
             success=True,
             incidents=demo_incidents,
             scan_time=datetime.now(),
@@ -386,5 +647,7 @@ Provide your analysis in this exact JSON format:
         )
 
 
-# Singleton instance
-scanner_agent = EmergencyScannerAgent()
+@lru_cache(maxsize=1)
+def get_scanner_agent() -> EmergencyScannerAgent:
+    """Shared scanner instance, built on first use"""
+    return EmergencyScannerAgent()
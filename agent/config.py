@@ -4,10 +4,13 @@ Centralized configuration management
 """
 
 import os
+from dataclasses import dataclass
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Optional, Dict, Tuple
 from functools import lru_cache
 
+from models import IncidentType
+
 
 class Settings(BaseSettings):
     """Application settings loaded from environment variables"""
@@ -28,6 +31,9 @@ class Settings(BaseSettings):
     # Agent Configuration
     agent_scan_interval_seconds: int = 60
     enable_auto_scan: bool = True
+    groq_max_concurrency: int = 10  # Concurrent Groq calls per scan
+    checkpoint_db: str = "varuna_state.db"  # LangGraph checkpoints; empty or workers > 1 disables
+    checkpoint_retention_seconds: int = 3600  # Failed runs stay resumable this long
     
     # Redis Configuration
     redis_url: str = "redis://localhost:6379"
@@ -35,6 +41,7 @@ class Settings(BaseSettings):
     # Server Configuration
     host: str = "0.0.0.0"
     port: int = 8001
+    workers: int = 1  # >1 shares scan results between workers through Redis
     debug: bool = True
     
     class Config:
@@ -48,172 +55,237 @@ def get_settings() -> Settings:
     return Settings()
 
 
+@dataclass(frozen=True, slots=True)
+class IncidentConfig:
+    """Casualty baseline and clinical profile for one incident type"""
+    base_min: int
+    base_max: int
+    base_likely: int
+    injury_types: Tuple[str, ...]
+    departments: Tuple[str, ...]
+    severity_multiplier: float
+
+
+@dataclass(frozen=True, slots=True)
+class HospitalCapacity:
+    beds: int
+    icu: int
+    available_beds: int
+
+
+@dataclass(frozen=True, slots=True)
+class Hospital:
+    """A hospital in the mesh network"""
+    id: str
+    name: str
+    lat: float
+    lng: float
+    distance_km: float
+    capacity: HospitalCapacity
+    specialties: Tuple[str, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class Vendor:
+    """An emergency supply vendor"""
+    id: str
+    name: str
+    resource_type: str
+    response_time_minutes: int
+    reliability_score: float
+    contact: str
+    capacity: str
+
+
 # Incident type configurations for casualty estimation
-INCIDENT_CONFIGS = {
-    "fire": {
-        "base_casualties": {"min": 5, "max": 50, "likely": 15},
-        "injury_types": ["Burns", "Smoke Inhalation", "Trauma", "Cardiac Events"],
-        "departments": ["Burn Unit", "Emergency", "ICU", "Pulmonology"],
-        "severity_multiplier": 1.2
-    },
-    "road_accident": {
-        "base_casualties": {"min": 2, "max": 20, "likely": 6},
-        "injury_types": ["Fractures", "Head Trauma", "Internal Bleeding", "Lacerations"],
-        "departments": ["Trauma", "Orthopedics", "Neurology", "Surgery"],
-        "severity_multiplier": 1.0
-    },
-    "building_collapse": {
-        "base_casualties": {"min": 10, "max": 100, "likely": 35},
-        "injury_types": ["Crush Injuries", "Fractures", "Internal Bleeding", "Asphyxiation"],
-        "departments": ["Trauma", "Orthopedics", "Surgery", "ICU"],
-        "severity_multiplier": 1.5
-    },
-    "chemical_spill": {
-        "base_casualties": {"min": 5, "max": 200, "likely": 30},
-        "injury_types": ["Chemical Burns", "Respiratory Distress", "Poisoning", "Eye Injuries"],
-        "departments": ["Toxicology", "Pulmonology", "Burns", "Ophthalmology"],
-        "severity_multiplier": 1.3
-    },
-    "gas_leak": {
-        "base_casualties": {"min": 10, "max": 500, "likely": 50},
-        "injury_types": ["Asphyxiation", "Respiratory Failure", "Burns", "Cardiac Events"],
-        "departments": ["Pulmonology", "Emergency", "ICU", "Cardiology"],
-        "severity_multiplier": 1.4
-    },
-    "stampede": {
-        "base_casualties": {"min": 20, "max": 300, "likely": 60},
-        "injury_types": ["Crush Injuries", "Fractures", "Asphyxiation", "Cardiac Events"],
-        "departments": ["Trauma", "Orthopedics", "Emergency", "Cardiology"],
-        "severity_multiplier": 1.6
-    },
-    "terror_attack": {
-        "base_casualties": {"min": 10, "max": 500, "likely": 50},
-        "injury_types": ["Blast Injuries", "Shrapnel Wounds", "Burns", "Trauma"],
-        "departments": ["Trauma", "Surgery", "Burns", "ICU"],
-        "severity_multiplier": 2.0
-    },
-    "train_accident": {
-        "base_casualties": {"min": 20, "max": 300, "likely": 80},
-        "injury_types": ["Fractures", "Head Trauma", "Internal Bleeding", "Burns"],
-        "departments": ["Trauma", "Orthopedics", "Neurology", "Surgery"],
-        "severity_multiplier": 1.8
-    },
-    "flood": {
-        "base_casualties": {"min": 5, "max": 100, "likely": 25},
-        "injury_types": ["Drowning", "Hypothermia", "Infections", "Trauma"],
-        "departments": ["Emergency", "Pulmonology", "Infectious Disease", "ICU"],
-        "severity_multiplier": 1.1
-    },
-    "epidemic_outbreak": {
-        "base_casualties": {"min": 50, "max": 5000, "likely": 500},
-        "injury_types": ["Fever", "Respiratory Distress", "Organ Failure", "Dehydration"],
-        "departments": ["Infectious Disease", "ICU", "Pulmonology", "Emergency"],
-        "severity_multiplier": 1.0
-    },
-    "unknown": {
-        "base_casualties": {"min": 1, "max": 50, "likely": 10},
-        "injury_types": ["Various", "Trauma", "Medical Emergency"],
-        "departments": ["Emergency", "Trauma", "ICU"],
-        "severity_multiplier": 1.0
-    }
+INCIDENT_CONFIGS: Dict[IncidentType, IncidentConfig] = {
+    IncidentType.FIRE: IncidentConfig(
+        base_min=5, base_max=50, base_likely=15,
+        injury_types=("Burns", "Smoke Inhalation", "Trauma", "Cardiac Events"),
+        departments=("Burn Unit", "Emergency", "ICU", "Pulmonology"),
+        severity_multiplier=1.2
+    ),
+    IncidentType.ROAD_ACCIDENT: IncidentConfig(
+        base_min=2, base_max=20, base_likely=6,
+        injury_types=("Fractures", "Head Trauma", "Internal Bleeding", "Lacerations"),
+        departments=("Trauma", "Orthopedics", "Neurology", "Surgery"),
+        severity_multiplier=1.0
+    ),
+    IncidentType.BUILDING_COLLAPSE: IncidentConfig(
+        base_min=10, base_max=100, base_likely=35,
+        injury_types=("Crush Injuries", "Fractures", "Internal Bleeding", "Asphyxiation"),
+        departments=("Trauma", "Orthopedics", "Surgery", "ICU"),
+        severity_multiplier=1.5
+    ),
+    IncidentType.CHEMICAL_SPILL: IncidentConfig(
+        base_min=5, base_max=200, base_likely=30,
+        injury_types=("Chemical Burns", "Respiratory Distress", "Poisoning", "Eye Injuries"),
+        departments=("Toxicology", "Pulmonology", "Burns", "Ophthalmology"),
+        severity_multiplier=1.3
+    ),
+    IncidentType.GAS_LEAK: IncidentConfig(
+        base_min=10, base_max=500, base_likely=50,
+        injury_types=("Asphyxiation", "Respiratory Failure", "Burns", "Cardiac Events"),
+        departments=("Pulmonology", "Emergency", "ICU", "Cardiology"),
+        severity_multiplier=1.4
+    ),
+    IncidentType.STAMPEDE: IncidentConfig(
+        base_min=20, base_max=300, base_likely=60,
+        injury_types=("Crush Injuries", "Fractures", "Asphyxiation", "Cardiac Events"),
+        departments=("Trauma", "Orthopedics", "Emergency", "Cardiology"),
+        severity_multiplier=1.6
+    ),
+    IncidentType.TERROR_ATTACK: IncidentConfig(
+        base_min=10, base_max=500, base_likely=50,
+        injury_types=("Blast Injuries", "Shrapnel Wounds", "Burns", "Trauma"),
+        departments=("Trauma", "Surgery", "Burns", "ICU"),
+        severity_multiplier=2.0
+    ),
+    IncidentType.TRAIN_ACCIDENT: IncidentConfig(
+        base_min=20, base_max=300, base_likely=80,
+        injury_types=("Fractures", "Head Trauma", "Internal Bleeding", "Burns"),
+        departments=("Trauma", "Orthopedics", "Neurology", "Surgery"),
+        severity_multiplier=1.8
+    ),
+    IncidentType.FLOOD: IncidentConfig(
+        base_min=5, base_max=100, base_likely=25,
+        injury_types=("Drowning", "Hypothermia", "Infections", "Trauma"),
+        departments=("Emergency", "Pulmonology", "Infectious Disease", "ICU"),
+        severity_multiplier=1.1
+    ),
+    IncidentType.EPIDEMIC_OUTBREAK: IncidentConfig(
+        base_min=50, base_max=5000, base_likely=500,
+        injury_types=("Fever", "Respiratory Distress", "Organ Failure", "Dehydration"),
+        departments=("Infectious Disease", "ICU", "Pulmonology", "Emergency"),
+        severity_multiplier=1.0
+    ),
+    IncidentType.UNKNOWN: IncidentConfig(
+        base_min=1, base_max=50, base_likely=10,
+        injury_types=("Various", "Trauma", "Medical Emergency"),
+        departments=("Emergency", "Trauma", "ICU"),
+        severity_multiplier=1.0
+    )
 }
 
 
 # Nearby hospitals for mesh network
-NEARBY_HOSPITALS = [
-    {
-        "id": "safdarjung",
-        "name": "Safdarjung Hospital",
-        "lat": 28.5679,
-        "lng": 77.2069,
-        "distance_km": 5.2,
-        "capacity": {"beds": 1500, "icu": 100, "available_beds": 45},
-        "specialties": ["Trauma", "Burns", "Cardiology"]
-    },
-    {
-        "id": "aiims",
-        "name": "AIIMS Delhi",
-        "lat": 28.5672,
-        "lng": 77.2100,
-        "distance_km": 5.5,
-        "capacity": {"beds": 2500, "icu": 200, "available_beds": 80},
-        "specialties": ["Neurology", "Cardiology", "Oncology", "Trauma"]
-    },
-    {
-        "id": "rml",
-        "name": "RML Hospital",
-        "lat": 28.6269,
-        "lng": 77.2050,
-        "distance_km": 2.1,
-        "capacity": {"beds": 800, "icu": 60, "available_beds": 25},
-        "specialties": ["General Surgery", "Orthopedics", "Emergency"]
-    },
-    {
-        "id": "gtb",
-        "name": "GTB Hospital",
-        "lat": 28.6866,
-        "lng": 77.3109,
-        "distance_km": 12.5,
-        "capacity": {"beds": 1800, "icu": 120, "available_beds": 60},
-        "specialties": ["Trauma", "Burns", "Pediatrics"]
-    },
-    {
-        "id": "lnjp",
-        "name": "LNJP Hospital",
-        "lat": 28.6369,
-        "lng": 77.2393,
-        "distance_km": 3.8,
-        "capacity": {"beds": 2000, "icu": 150, "available_beds": 55},
-        "specialties": ["Infectious Disease", "Pulmonology", "Emergency"]
-    }
-]
+NEARBY_HOSPITALS: Tuple[Hospital, ...] = (
+    Hospital(
+        id="safdarjung",
+        name="Safdarjung Hospital",
+        lat=28.5679,
+        lng=77.2069,
+        distance_km=5.2,
+        capacity=HospitalCapacity(beds=1500, icu=100, available_beds=45),
+        specialties=("Trauma", "Burns", "Cardiology")
+    ),
+    Hospital(
+        id="aiims",
+        name="AIIMS Delhi",
+        lat=28.5672,
+        lng=77.2100,
+        distance_km=5.5,
+        capacity=HospitalCapacity(beds=2500, icu=200, available_beds=80),
+        specialties=("Neurology", "Cardiology", "Oncology", "Trauma")
+    ),
+    Hospital(
+        id="rml",
+        name="RML Hospital",
+        lat=28.6269,
+        lng=77.2050,
+        distance_km=2.1,
+        capacity=HospitalCapacity(beds=800, icu=60, available_beds=25),
+        specialties=("General Surgery", "Orthopedics", "Emergency")
+    ),
+    Hospital(
+        id="gtb",
+        name="GTB Hospital",
+        lat=28.6866,
+        lng=77.3109,
+        distance_km=12.5,
+        capacity=HospitalCapacity(beds=1800, icu=120, available_beds=60),
+        specialties=("Trauma", "Burns", "Pediatrics")
+    ),
+    Hospital(
+        id="lnjp",
+        name="LNJP Hospital",
+        lat=28.6369,
+        lng=77.2393,
+        distance_km=3.8,
+        capacity=HospitalCapacity(beds=2000, icu=150, available_beds=55),
+        specialties=("Infectious Disease", "Pulmonology", "Emergency")
+    )
+)
 
 
 # Vendor configurations
-VENDORS = [
-    {
-        "id": "vendor_oxygen_1",
-        "name": "Delhi Oxygen Supplies",
-        "resource_type": "oxygen",
-        "response_time_minutes": 30,
-        "reliability_score": 0.95,
-        "contact": "+91-11-2345-6789",
-        "capacity": "Unlimited"
-    },
-    {
-        "id": "vendor_blood_1",
-        "name": "Central Blood Bank",
-        "resource_type": "blood",
-        "response_time_minutes": 45,
-        "reliability_score": 0.92,
-        "contact": "+91-11-3456-7890",
-        "capacity": "500 units/day"
-    },
-    {
-        "id": "vendor_meds_1",
-        "name": "PharmaCare Express",
-        "resource_type": "medications",
-        "response_time_minutes": 60,
-        "reliability_score": 0.88,
-        "contact": "+91-11-4567-8901",
-        "capacity": "Full formulary"
-    },
-    {
-        "id": "vendor_equipment_1",
-        "name": "MedEquip Rentals",
-        "resource_type": "equipment",
-        "response_time_minutes": 120,
-        "reliability_score": 0.85,
-        "contact": "+91-11-5678-9012",
-        "capacity": "Ventilators, Monitors, Beds"
-    },
-    {
-        "id": "vendor_ambulance_1",
-        "name": "Delhi EMS Network",
-        "resource_type": "ambulance",
-        "response_time_minutes": 15,
-        "reliability_score": 0.97,
-        "contact": "102",
-        "capacity": "50 ambulances"
-    }
-]
+VENDORS: Tuple[Vendor, ...] = (
+    Vendor(
+        id="vendor_oxygen_1",
+        name="Delhi Oxygen Supplies",
+        resource_type="oxygen",
+        response_time_minutes=30,
+        reliability_score=0.95,
+        contact="+91-11-2345-6789",
+        capacity="Unlimited"
+    ),
+    Vendor(
+        id="vendor_blood_1",
+        name="Central Blood Bank",
+        resource_type="blood",
+        response_time_minutes=45,
+        reliability_score=0.92,
+        contact="+91-11-3456-7890",
+        capacity="500 units/day"
+    ),
+    Vendor(
+        id="vendor_meds_1",
+        name="PharmaCare Express",
+        resource_type="medications",
+        response_time_minutes=60,
+        reliability_score=0.88,
+        contact="+91-11-4567-8901",
+        capacity="Full formulary"
+    ),
+    Vendor(
+        id="vendor_equipment_1",
+        name="MedEquip Rentals",
+        resource_type="equipment",
+        response_time_minutes=120,
+        reliability_score=0.85,
+        contact="+91-11-5678-9012",
+        capacity="Ventilators, Monitors, Beds"
+    ),
+    Vendor(
+        id="vendor_ambulance_1",
+        name="Delhi EMS Network",
+        resource_type="ambulance",
+        response_time_minutes=15,
+        reliability_score=0.97,
+        contact="102",
+        capacity="50 ambulances"
+    )
+)
+
+
+# Delhi NCR localities recognized in news text (approximate centre lat, lng),
+# in match priority order
+DELHI_LOCATIONS: Dict[str, Tuple[float, float]] = {
+    "Connaught Place": (28.6315, 77.2167),
+    "Karol Bagh": (28.6519, 77.1903),
+    "Chandni Chowk": (28.6506, 77.2303),
+    "Dwarka": (28.5921, 77.0460),
+    "Rohini": (28.7495, 77.0565),
+    "Pitampura": (28.7033, 77.1322),
+    "Janakpuri": (28.6219, 77.0878),
+    "Saket": (28.5245, 77.2066),
+    "Nehru Place": (28.5494, 77.2519),
+    "Lajpat Nagar": (28.5677, 77.2433),
+    "Greater Kailash": (28.5482, 77.2380),
+    "Hauz Khas": (28.5494, 77.2001),
+    "Vasant Kunj": (28.5200, 77.1590),
+    "Noida": (28.5355, 77.3910),
+    "Gurgaon": (28.4595, 77.0266),
+    "Faridabad": (28.4089, 77.3178),
+    "Ghaziabad": (28.6692, 77.4538)
+}
@@ -6,64 +6,211 @@ Main entry point for the AI Agent backend with LangGraph workflow
 import asyncio
 from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Optional
+from functools import lru_cache
+import logging
+import sys
+from typing import Any, Optional
+import orjson
 import uvicorn
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
+from langchain_groq import ChatGroq
+from langchain_core.prompts import ChatPromptTemplate
 
 from config import get_settings
+from redis_client import redis_client
 from models import (
     ScanRequest, ScanResponse,
     OrchestrationRequest, OrchestrationResponse,
     LearningRequest, LearningResponse,
     ChatRequest, ChatResponse,
-    IncidentReport
+    IncidentReport, SeverityLevel
 )
-from agents.scanner import scanner_agent
+from agents.scanner import get_scanner_agent
 from agents.orchestrator import orchestrator
 from agents.learning import learning_agent
 from agents.graph import varuna_agent, VarunaAgent
 
 
+# Agents report errors through the logging module
+logging.basicConfig(
+    level=logging.INFO if get_settings().debug else logging.WARNING,
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Placeholder Tavily keys that mean "no key configured" - fall back to demo scans
+_DEMO_KEY_SENTINELS = frozenset({"", "demo", "tvly-your-key-here", "tvly-dev-your-key-here"})
+_REAL_TAVILY = get_settings().tavily_api_key not in _DEMO_KEY_SENTINELS
+
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _json_response(content: Any) -> Response:
+    """
+    Serialize a response body directly (pydantic-core for models, orjson
+    otherwise), skipping FastAPI's jsonable_encoder and response-model
+    revalidation; response_model stays on the routes for the OpenAPI schema
+    """
+    if isinstance(content, BaseModel):
+        body = content.model_dump_json()
+    else:
+        body = orjson.dumps(content, option=_ORJSON_OPTIONS)
+    return Response(body, media_type="application/json")
+
+
 # Background scanning state
 class AgentState:
     def __init__(self):
         self.is_scanning = False
-        self.last_scan: Optional[datetime] = None
+        self.last_scan: Optional[str] = None  # ISO timestamp, formatted once per scan
         self.active_incidents: list[IncidentReport] = []
         self.scan_task: Optional[asyncio.Task] = None
+        self.scan_stop: Optional[asyncio.Event] = None
+        self.task_group: Optional[asyncio.TaskGroup] = None
         self.langgraph_agent: VarunaAgent = varuna_agent
+        self.incidents_json: bytes = self._render_incidents()
+
+    def record_scan(self, incidents: list[IncidentReport]):
+        """Store a scan's incidents and pre-render the /api/incidents body"""
+        self.active_incidents = incidents
+        self.last_scan = datetime.now().isoformat()
+        self.incidents_json = self._render_incidents()
+
+    def _render_incidents(self) -> bytes:
+        return orjson.dumps({
+            "incidents": [inc.model_dump() for inc in self.active_incidents],
+            "last_scan": self.last_scan,
+            "count": len(self.active_incidents)
+        }, option=_ORJSON_OPTIONS)
 
 
 state = AgentState()
 
+# With several uvicorn workers, one worker per interval runs the background
+# scan and publishes the rendered incident list and its summary for the
+# others to serve; the scan on/off switch is shared the same way
+_SHARED_STATE = get_settings().workers > 1
+SCAN_LOCK_KEY = "agent:scan_lock"
+SCAN_ENABLED_KEY = "agent:scan_enabled"
+INCIDENTS_CACHE_KEY = "agent:active_incidents"
+SCAN_SUMMARY_KEY = "agent:scan_summary"
+
+
+async def _publish_incidents():
+    """Share the latest rendered incident list with the other workers"""
+    if _SHARED_STATE:
+        await redis_client.set_many_ex({
+            INCIDENTS_CACHE_KEY: state.incidents_json,
+            SCAN_SUMMARY_KEY: orjson.dumps({
+                "active_incidents": len(state.active_incidents),
+                "last_scan": state.last_scan
+            }),
+        }, ex=3600)
+
+
+async def _scan_summary() -> tuple[int, Optional[str]]:
+    """Active incident count and last scan time, across workers when shared"""
+    if _SHARED_STATE:
+        summary = await redis_client.get_json(SCAN_SUMMARY_KEY)
+        if summary:
+            return summary["active_incidents"], summary["last_scan"]
+    return len(state.active_incidents), state.last_scan
+
+
+async def _scan_enabled() -> bool:
+    """Whether background scanning is switched on, across workers when shared"""
+    if _SHARED_STATE:
+        flag = await redis_client.get(SCAN_ENABLED_KEY)
+        if flag is not None:
+            return flag == "1"
+    return state.is_scanning
+
+
+async def _set_scan_enabled(enabled: bool):
+    """Switch background scanning for every worker (kept until switched again)"""
+    if _SHARED_STATE:
+        await redis_client.set(SCAN_ENABLED_KEY, "1" if enabled else "0", ex=None)
+
 
-async def background_scanner():
+# Severities the background scanner hands to the learning agent
+_ESCALATE = frozenset({SeverityLevel.CRITICAL, SeverityLevel.HIGH})
+
+
+async def _wait_for_stop(stop: asyncio.Event, seconds: float):
+    """Sleep between scans, waking early once scanning is stopped"""
+    try:
+        await asyncio.wait_for(stop.wait(), timeout=seconds)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def background_scanner(stop: asyncio.Event):
     """Continuous background scanning for incidents"""
     settings = get_settings()
-    while state.is_scanning:
+    while not stop.is_set():
         try:
+            # Scanning was stopped through another worker
+            if _SHARED_STATE and await redis_client.get(SCAN_ENABLED_KEY) == "0":
+                await _wait_for_stop(stop, settings.agent_scan_interval_seconds)
+                continue
+            
+            # Another worker holds this interval's scan
+            if _SHARED_STATE and not await redis_client.set_nx(
+                SCAN_LOCK_KEY, ex=settings.agent_scan_interval_seconds
+            ) and redis_client.enabled:
+                await _wait_for_stop(stop, settings.agent_scan_interval_seconds)
+                continue
+            
             # Use demo scan for testing, real scan in production
-            if settings.tavily_api_key and settings.tavily_api_key not in ["", "demo", "tvly-your-key-here", "tvly-dev-your-key-here"]:
-                result = await scanner_agent.scan(ScanRequest())
+            if _REAL_TAVILY:
+                result = await get_scanner_agent().scan(ScanRequest())
             else:
-                result = await scanner_agent.scan_demo()
+                result = await get_scanner_agent().scan_demo()
             
-            state.active_incidents = result.incidents
-            state.last_scan = datetime.now()
+            state.record_scan(result.incidents)
+            await _publish_incidents()
             
             # Auto-orchestrate for critical incidents
             for incident in result.incidents:
-                if incident.severity.value in ["critical", "high"]:
+                if incident.severity in _ESCALATE:
                     learning_agent.cache_incident(incident)
                     # Could auto-trigger orchestration here
             
         except Exception as e:
-            print(f"Background scan error: {e}")
+            logger.exception("Background scan error: %s", e)
         
-        await asyncio.sleep(settings.agent_scan_interval_seconds)
+        await _wait_for_stop(stop, settings.agent_scan_interval_seconds)
+
+
+async def checkpoint_pruner(stop: asyncio.Event):
+    """Prune stale LangGraph checkpoints at startup, then once per retention window"""
+    interval = get_settings().checkpoint_retention_seconds
+    while not stop.is_set():
+        try:
+            await state.langgraph_agent.prune_checkpoints()
+        except Exception as e:
+            logger.exception("Checkpoint prune error: %s", e)
+        await _wait_for_stop(stop, interval)
+
+
+def start_background_scan():
+    """Run background_scanner in the app's task group until stopped"""
+    state.is_scanning = True
+    state.scan_stop = asyncio.Event()
+    state.scan_task = state.task_group.create_task(background_scanner(state.scan_stop))
+
+
+def stop_background_scan():
+    """Signal the scanner to exit at its next check (no task cancellation)"""
+    state.is_scanning = False
+    if state.scan_stop:
+        state.scan_stop.set()
 
 
 @asynccontextmanager
@@ -71,23 +218,27 @@ async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
     settings = get_settings()
     
-    # Start background scanning if enabled
-    if settings.enable_auto_scan:
-        state.is_scanning = True
-        state.scan_task = asyncio.create_task(background_scanner())
-        print("🔍 Background incident scanner started")
-    
-    yield
-    
-    # Cleanup
-    state.is_scanning = False
-    if state.scan_task:
-        state.scan_task.cancel()
-        try:
-            await state.scan_task
-        except asyncio.CancelledError:
-            pass
-    print("👋 Agent shutdown complete")
+    # Background tasks live in one group; leaving it waits for them to finish
+    async with asyncio.TaskGroup() as tg:
+        state.task_group = tg
+        pruner_stop = asyncio.Event()
+        tg.create_task(checkpoint_pruner(pruner_stop))
+        
+        # Start background scanning if enabled
+        await _set_scan_enabled(settings.enable_auto_scan)
+        if settings.enable_auto_scan:
+            start_background_scan()
+            logger.info("🔍 Background incident scanner started")
+        
+        yield
+        
+        # Cleanup: an in-flight scan completes, then the loop exits
+        stop_background_scan()
+        pruner_stop.set()
+    state.task_group = None
+    if get_scanner_agent.cache_info().currsize:
+        await get_scanner_agent().aclose()
+    logger.info("👋 Agent shutdown complete")
 
 
 # Create FastAPI app
@@ -103,10 +254,15 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://127.0.0.1:3000"],
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    # Explicit lists (what the frontend sends) and a cached preflight
+    allow_methods=["GET", "POST", "OPTIONS"],
+    allow_headers=["Content-Type", "Authorization"],
+    max_age=3600,
 )
 
+# Incident/resource lists are repetitive JSON that compresses well
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 
 # ============== Health & Status ==============
 
@@ -117,17 +273,18 @@ async def root():
         "status": "online",
         "service": "Varuna AI Agent",
         "version": "1.0.0",
-        "timestamp": datetime.now().isoformat()
+        "timestamp": datetime.now().isoformat(timespec="seconds")
     }
 
 
 @app.get("/status")
 async def get_status():
     """Get agent status"""
+    active_incidents, last_scan = await _scan_summary()
     return {
-        "scanning": state.is_scanning,
-        "last_scan": state.last_scan.isoformat() if state.last_scan else None,
-        "active_incidents": len(state.active_incidents),
+        "scanning": await _scan_enabled(),
+        "last_scan": last_scan,
+        "active_incidents": active_incidents,
         "uptime": "operational"
     }
 
@@ -141,23 +298,21 @@ async def scan_for_incidents(request: ScanRequest = ScanRequest()):
     Returns analyzed incidents with casualty estimates
     """
     try:
-        settings = get_settings()
-        
         # Use real Tavily if API key is configured
-        if settings.tavily_api_key and settings.tavily_api_key not in ["", "demo", "tvly-your-key-here", "tvly-dev-your-key-here"]:
-            result = await scanner_agent.scan(request)
+        if _REAL_TAVILY:
+            result = await get_scanner_agent().scan(request)
         else:
             # Use demo mode for testing
-            result = await scanner_agent.scan_demo()
+            result = await get_scanner_agent().scan_demo()
         
         # Cache incidents for learning
         for incident in result.incidents:
             learning_agent.cache_incident(incident)
         
-        state.active_incidents = result.incidents
-        state.last_scan = datetime.now()
+        state.record_scan(result.incidents)
+        await _publish_incidents()
         
-        return result
+        return _json_response(result)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -166,11 +321,11 @@ async def scan_for_incidents(request: ScanRequest = ScanRequest()):
 @app.get("/api/incidents")
 async def get_active_incidents():
     """Get currently active incidents from last scan"""
-    return {
-        "incidents": [inc.model_dump() for inc in state.active_incidents],
-        "last_scan": state.last_scan.isoformat() if state.last_scan else None,
-        "count": len(state.active_incidents)
-    }
+    # Rendered once per scan; polling just resends the bytes
+    body = state.incidents_json
+    if _SHARED_STATE:
+        body = await redis_client.get(INCIDENTS_CACHE_KEY) or body
+    return Response(body, media_type="application/json")
 
 
 # ============== Resource Orchestration ==============
@@ -185,7 +340,7 @@ async def orchestrate_resources(request: OrchestrationRequest):
     """
     try:
         result = await orchestrator.orchestrate(request)
-        return result
+        return _json_response(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -195,10 +350,10 @@ async def get_resource_status():
     """Get current hospital resource status"""
     try:
         resources = await orchestrator._get_resource_status()
-        return {
+        return _json_response({
             "resources": [r.model_dump() for r in resources],
-            "timestamp": datetime.now().isoformat()
-        }
+            "timestamp": datetime.now().isoformat(timespec="seconds")
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -213,7 +368,7 @@ async def analyze_incident(request: LearningRequest):
     """
     try:
         result = await learning_agent.analyze(request)
-        return result
+        return _json_response(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -223,70 +378,73 @@ async def get_learning_trends(days: int = 30):
     """Get performance trends over time"""
     try:
         trends = await learning_agent.get_performance_trends(days)
-        return trends
+        return _json_response(trends)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 # ============== AI Chat ==============
 
+# Chat system prompt, parsed once at import
+_CHAT_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are Varuna AI, an advanced emergency operations assistant.
+You help hospital administrators manage crisis situations.
+
+Current Status:
+- Active Incidents: {active_incidents}
+- Last Scan: {last_scan}
+
+Be concise, professional, and prioritize patient safety in all recommendations."""),
+    ("human", "{message}")
+])
+
+
+@lru_cache(maxsize=1)
+def _get_chat_llm() -> ChatGroq:
+    """Chat LLM client, built on first use and reused across requests"""
+    settings = get_settings()
+    return ChatGroq(
+        api_key=settings.groq_api_key,
+        model_name="llama-3.3-70b-versatile",
+        temperature=0.7
+    )
+
+
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat_with_agent(request: ChatRequest):
     """
     Chat with the AI agent for operational queries
     Uses LangGraph workflow for intelligent responses
     """
+    active_incidents, last_scan = await _scan_summary()
     try:
-        from langchain_groq import ChatGroq
-        from langchain_core.prompts import ChatPromptTemplate
-        
-        settings = get_settings()
-        llm = ChatGroq(
-            api_key=settings.groq_api_key,
-            model_name="llama-3.3-70b-versatile",
-            temperature=0.7
-        )
-        
         # Build context
         context = request.context or {}
-        context["active_incidents"] = len(state.active_incidents)
-        context["last_scan"] = state.last_scan.isoformat() if state.last_scan else "Never"
-        
-        # System prompt
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are Varuna AI, an advanced emergency operations assistant.
-You help hospital administrators manage crisis situations.
-
-Current Status:
-- Active Incidents: {active_incidents}
-- Last Scan: {last_scan}
-
-Be concise, professional, and prioritize patient safety in all recommendations."""),
-            ("human", "{message}")
-        ])
+        context["active_incidents"] = active_incidents
+        context["last_scan"] = last_scan or "Never"
         
-        formatted = prompt.format_messages(
+        formatted = _CHAT_PROMPT.format_messages(
             active_incidents=context["active_incidents"],
             last_scan=context["last_scan"],
             message=request.message
         )
         
-        response = await llm.ainvoke(formatted)
+        response = await _get_chat_llm().ainvoke(formatted)
         
-        return ChatResponse(
+        return _json_response(ChatResponse(
             success=True,
             response=response.content,
             source="groq-llama-3.3-70b",
             tools_used=[]
-        )
+        ))
         
     except Exception as e:
-        return ChatResponse(
+        return _json_response(ChatResponse(
             success=True,
-            response=f"I'm experiencing connectivity issues. Current status: {len(state.active_incidents)} active incidents. {str(e)}",
+            response=f"I'm experiencing connectivity issues. Current status: {active_incidents} active incidents. {str(e)}",
             source="fallback",
             tools_used=[]
-        )
+        ))
 
 
 # ============== LangGraph Agent Endpoint ==============
@@ -295,6 +453,7 @@ class LangGraphRequest(BaseModel):
     """Request for LangGraph agent"""
     query: str
     scan: bool = True
+    resume_thread: Optional[str] = None  # thread_id of a failed run to retry
 
 
 @app.post("/api/agent/run")
@@ -303,7 +462,7 @@ async def run_langgraph_agent(request: LangGraphRequest):
     Run the LangGraph-based emergency response agent
     
     This endpoint triggers the full agent workflow:
-    1. Scanner Node - Detects and analyzes incidents
+    1. Scanner Node - Detects and analyzes incidents (in parallel with the resource fetch)
     2. Analyzer Node - Assesses hospital capacity
     3. Orchestrator Node - Coordinates resources (if needed)
     4. Responder Node - Generates final response
@@ -311,23 +470,46 @@ async def run_langgraph_agent(request: LangGraphRequest):
     try:
         result = await state.langgraph_agent.run(
             query=request.query,
-            scan=request.scan
+            scan=request.scan,
+            resume_thread=request.resume_thread
         )
-        return result
+        return _json_response(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/agent/stream")
+async def stream_langgraph_agent(request: LangGraphRequest):
+    """
+    Run the LangGraph agent, streaming newline-delimited JSON events
+    
+    Each incident is sent as soon as the scanner parses it, followed by
+    a final "result" event with the same payload as /api/agent/run.
+    """
+    async def events():
+        try:
+            async for event in state.langgraph_agent.stream(
+                query=request.query,
+                scan=request.scan,
+                resume_thread=request.resume_thread
+            ):
+                yield orjson.dumps(event) + b"\n"
+        except Exception as e:
+            yield orjson.dumps({"type": "error", "detail": str(e)}) + b"\n"
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
 @app.get("/api/agent/graph")
 async def get_graph_info():
     """Get information about the LangGraph workflow"""
     return {
         "name": "Varuna LangGraph Agent",
         "version": "1.0.0",
-        "nodes": ["scanner", "analyzer", "orchestrator", "responder"],
+        "nodes": ["scanner", "analyzer_fetch", "analyzer", "orchestrator", "responder"],
         "description": "Stateful emergency response workflow using LangGraph",
         "framework": "LangGraph + Pydantic",
-        "llm": "Groq (Llama 3.3 70B)"
+        "llm": "Groq (Llama 3.1 8B scanner, Llama 3.3 70B orchestrator)"
     }
 
 
@@ -335,20 +517,21 @@ async def get_graph_info():
 
 @app.post("/api/control/start-scan")
 async def start_scanning():
-    """Start background incident scanning"""
+    """Start background incident scanning (on every worker when shared)"""
+    already_scanning = await _scan_enabled()
+    await _set_scan_enabled(True)
     if not state.is_scanning:
-        state.is_scanning = True
-        state.scan_task = asyncio.create_task(background_scanner())
-        return {"message": "Scanning started", "status": "active"}
-    return {"message": "Already scanning", "status": "active"}
+        start_background_scan()
+    if already_scanning:
+        return {"message": "Already scanning", "status": "active"}
+    return {"message": "Scanning started", "status": "active"}
 
 
 @app.post("/api/control/stop-scan")
 async def stop_scanning():
-    """Stop background incident scanning"""
-    state.is_scanning = False
-    if state.scan_task:
-        state.scan_task.cancel()
+    """Stop background incident scanning (on every worker when shared)"""
+    await _set_scan_enabled(False)
+    stop_background_scan()
     return {"message": "Scanning stopped", "status": "inactive"}
 
 
@@ -371,5 +554,9 @@ if __name__ == "__main__":
         "main:app",
         host=settings.host,
         port=settings.port,
-        reload=False  # Disable reload for Windows compatibility
+        # Pin the fast loop/parser from uvicorn[standard] so a missing extra fails loudly;
+        # uvloop has no Windows build
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        workers=settings.workers
     )
@@ -3,81 +3,212 @@ Redis Client for Caching and Deduplication
 Uses Upstash Redis or standard Redis
 """
 
+import asyncio
 import os
-import json
-from typing import Optional, Any
-import redis
+import weakref
+import zlib
+from functools import lru_cache
+from typing import Optional, Any, Dict, List
+import orjson
+import redis.asyncio as aioredis
 from config import get_settings
 
-class RedisManager:
-    _instance = None
+# Fast zlib level: news text still compresses ~3x
+PACKED_COMPRESSION_LEVEL = 3
+
+# Deletes a lock only while it still holds the caller's token, so an owner
+# whose lock expired cannot release the lock another process now holds
+RELEASE_LOCK_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
 
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(RedisManager, cls).__new__(cls)
-            cls._instance._initialize()
-        return cls._instance
+# Connection pool sized for scanner bursts plus concurrent API requests
+POOL_OPTIONS = {
+    "max_connections": 100,
+    "health_check_interval": 30,
+    "socket_keepalive": True,
+}
 
-    def _initialize(self):
+
+class RedisManager:
+    def __init__(self):
         settings = get_settings()
         # Default to localhost if not provided, or use UPSTASH_REDIS_REST_URL if using HTTP client
         # Here we use the standard redis client which works with Upstash connection strings
-        redis_url = settings.redis_url
+        self.redis_url = settings.redis_url
         
-        try:
-            self.client = redis.from_url(redis_url, decode_responses=True)
-            # Test connection
-            self.client.ping()
-            self.enabled = True
-            print(f"✅ Redis connected: {redis_url}")
-        except Exception as e:
-            print(f"⚠️ Redis connection failed: {e}. Caching disabled.")
-            self.enabled = False
+        # Decided by a PING on first use rather than at import
+        self.enabled: Optional[bool] = None
+        
+        # asyncio connections belong to the loop that opened them, so each
+        # event loop gets its own pair of clients
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aioredis.Redis]" = weakref.WeakKeyDictionary()
+        self._raw_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aioredis.Redis]" = weakref.WeakKeyDictionary()
+
+    async def connect(self) -> bool:
+        """Check Redis is reachable (once); returns whether caching is enabled"""
+        if self.enabled is None:
+            try:
+                await self.client.ping()
+                self.enabled = True
+                print(f"✅ Redis connected: {self.redis_url}")
+            except Exception as e:
+                print(f"⚠️ Redis connection failed: {e}. Caching disabled.")
+                self.enabled = False
+        return self.enabled
+
+    @property
+    def client(self) -> aioredis.Redis:
+        """Async client for the running event loop"""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._clients[loop] = aioredis.from_url(self.redis_url, decode_responses=True, **POOL_OPTIONS)
+        return client
 
-    def get(self, key: str) -> Optional[str]:
-        if not self.enabled:
+    @property
+    def raw_client(self) -> aioredis.Redis:
+        """Async client for binary values (compressed caches skip the UTF-8 decode)"""
+        loop = asyncio.get_running_loop()
+        client = self._raw_clients.get(loop)
+        if client is None:
+            client = self._raw_clients[loop] = aioredis.from_url(self.redis_url, decode_responses=False, **POOL_OPTIONS)
+        return client
+
+    async def get(self, key: str) -> Optional[str]:
+        if not await self.connect():
             return None
         try:
-            return self.client.get(key)
+            return await self.client.get(key)
         except Exception as e:
             print(f"Redis GET error: {e}")
             return None
 
-    def set(self, key: str, value: str, ex: int = 3600) -> bool:
-        """Set key with expiry (default 1 hour)"""
-        if not self.enabled:
+    async def set(self, key: str, value: str, ex: Optional[int] = 3600) -> bool:
+        """Set key with expiry (default 1 hour; None keeps it until overwritten)"""
+        if not await self.connect():
             return False
         try:
-            return self.client.set(key, value, ex=ex)
+            return await self.client.set(key, value, ex=ex)
         except Exception as e:
             print(f"Redis SET error: {e}")
             return False
 
-    def exists(self, key: str) -> bool:
-        if not self.enabled:
+    async def set_nx(self, key: str, value: str = "1", ex: int = 10) -> bool:
+        """Set key only if it does not exist (lock acquisition)"""
+        if not await self.connect():
+            return False
+        try:
+            return bool(await self.client.set(key, value, ex=ex, nx=True))
+        except Exception as e:
+            print(f"Redis SETNX error: {e}")
+            return False
+
+    async def release_lock(self, key: str, token: str) -> bool:
+        """Delete a lock taken with set_nx(key, token) if this owner still holds it"""
+        if not await self.connect():
+            return False
+        try:
+            return bool(await self.client.eval(RELEASE_LOCK_SCRIPT, 1, key, token))
+        except Exception as e:
+            print(f"Redis lock release error: {e}")
+            return False
+
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        """Fetch several keys in one round-trip (MGET)"""
+        if not keys or not await self.connect():
+            return [None] * len(keys)
+        try:
+            return await self.client.mget(keys)
+        except Exception as e:
+            print(f"Redis MGET error: {e}")
+            return [None] * len(keys)
+
+    async def set_many_ex(self, items: Dict[str, str], ex: int = 3600) -> bool:
+        """Set several keys with the same expiry in one pipelined round-trip"""
+        if not items or not await self.connect():
             return False
         try:
-            return self.client.exists(key) > 0
+            pipe = self.client.pipeline(transaction=False)
+            for key, value in items.items():
+                pipe.set(key, value, ex=ex)
+            await pipe.execute()
+            return True
+        except Exception as e:
+            print(f"Redis pipeline SET error: {e}")
+            return False
+
+    async def exists(self, key: str) -> bool:
+        if not await self.connect():
+            return False
+        try:
+            return await self.client.exists(key) > 0
         except Exception as e:
             print(f"Redis EXISTS error: {e}")
             return False
 
-    def cache_json(self, key: str, data: Any, ex: int = 300) -> bool:
+    async def cache_json(self, key: str, data: Any, ex: int = 300) -> bool:
         """Cache a JSON serializable object"""
         try:
-            return self.set(key, json.dumps(data), ex=ex)
+            return await self.set(key, orjson.dumps(data), ex=ex)
         except Exception:
             return False
 
-    def get_json(self, key: str) -> Optional[Any]:
+    async def get_json(self, key: str) -> Optional[Any]:
         """Retrieve and parse a JSON object"""
-        data = self.get(key)
+        data = await self.get(key)
         if data:
             try:
-                return json.loads(data)
-            except json.JSONDecodeError:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
                 return None
         return None
 
+    async def get_json_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """Retrieve and parse several JSON objects in one round-trip"""
+        parsed = []
+        for data in await self.get_many(keys):
+            try:
+                parsed.append(orjson.loads(data) if data else None)
+            except orjson.JSONDecodeError:
+                parsed.append(None)
+        return parsed
+
+    async def cache_packed(self, key: str, data: Any, ex: int = 300) -> bool:
+        """Cache a JSON serializable object as zlib-compressed orjson bytes"""
+        if not await self.connect():
+            return False
+        try:
+            return await self.raw_client.set(key, zlib.compress(orjson.dumps(data), PACKED_COMPRESSION_LEVEL), ex=ex)
+        except Exception as e:
+            print(f"Redis SET error: {e}")
+            return False
+
+    async def get_packed_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """Retrieve several objects stored with cache_packed in one round-trip"""
+        if not keys or not await self.connect():
+            return [None] * len(keys)
+        try:
+            values = await self.raw_client.mget(keys)
+        except Exception as e:
+            print(f"Redis MGET error: {e}")
+            return [None] * len(keys)
+        unpacked = []
+        for data in values:
+            try:
+                unpacked.append(orjson.loads(zlib.decompress(data)) if data else None)
+            except (zlib.error, orjson.JSONDecodeError):
+                unpacked.append(None)
+        return unpacked
+
+@lru_cache(maxsize=1)
+def get_redis() -> RedisManager:
+    """Shared RedisManager, created on first call"""
+    return RedisManager()
+
+
 # Global instance
-redis_client = RedisManager()
+redis_client = get_redis()
@@ -1,3 +1,4 @@
+import asyncio
 import os
 from dotenv import load_dotenv
 
@@ -6,16 +7,16 @@ load_dotenv()
 
 from redis_client import redis_client
 
-def test_redis_connection():
+async def test_redis_connection():
     print("Testing Redis Connection...")
     print(f"REDIS_URL: {os.getenv('REDIS_URL')}")
     
-    if redis_client.enabled:
+    if await redis_client.connect():
         print("✅ Redis Client is ENABLED")
         
         # Test Set
         print("Attempting to SET a key...")
-        success = redis_client.set("test_key", "Hello Varuna", ex=60)
+        success = await redis_client.set("test_key", "Hello Varuna", ex=60)
         if success:
             print("✅ SET successful")
         else:
@@ -23,7 +24,7 @@ def test_redis_connection():
             
         # Test Get
         print("Attempting to GET the key...")
-        value = redis_client.get("test_key")
+        value = await redis_client.get("test_key")
         if value == "Hello Varuna":
             print(f"✅ GET successful: {value}")
         else:
@@ -33,4 +34,4 @@ def test_redis_connection():
         print("❌ Redis Client is DISABLED (Connection failed during initialization)")
 
 if __name__ == "__main__":
-    test_redis_connection()
+    asyncio.run(test_redis_connection())
@@ -8,7 +8,8 @@ It acts as the unpredictable external world, simulating pollution spikes,
 patient surges, and emergency scenarios.
 
 Requirements:
-    pip install supabase faker python-dotenv
+    pip install numpy supabase faker python-dotenv
+    pip install asyncpg  # optional, for COPY inserts via SUPABASE_DB_URL
     
 Usage:
     python simulation_agent.py
@@ -21,21 +22,37 @@ Usage:
 import os
 import sys
 import time
-import random
+import secrets
 import argparse
+import asyncio
+import logging
+from logging.handlers import QueueHandler, QueueListener
+import queue
+from bisect import bisect_right
+from collections import deque
+from itertools import accumulate
+from operator import attrgetter
+from functools import lru_cache, partial
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 import uuid
 
 try:
+    import numpy as np
     from supabase import create_client, Client
     from faker import Faker
     from dotenv import load_dotenv
 except ImportError:
     print("Missing required packages. Install with:")
-    print("  pip install supabase faker python-dotenv")
+    print("  pip install numpy supabase faker python-dotenv")
     sys.exit(1)
 
+try:  # direct Postgres COPY for patients is optional
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
 # Load environment variables
 load_dotenv()
 load_dotenv('.env.local')
@@ -55,7 +72,34 @@ else:
 if not DEMO_MODE:
     supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+# With a Postgres DSN, patient batches are COPY'd directly instead of POSTed to the REST API
+SUPABASE_DB_URL = os.getenv("SUPABASE_DB_URL", "")
+if SUPABASE_DB_URL and asyncpg is None:
+    print("⚠️  Warning: SUPABASE_DB_URL is set but asyncpg is not installed (pip install asyncpg)")
+USE_REST = not (SUPABASE_DB_URL and asyncpg)
+
+# Simulation output is queued; a listener thread does the stdout writes
+logger = logging.getLogger("varuna.simulation")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+_log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue()
+logger.addHandler(QueueHandler(_log_queue))
+_log_listener = QueueListener(_log_queue, logging.StreamHandler(sys.stdout))
+
+# Optional seed for reproducible runs; applied per instance, never to global RNG state
+_seed = os.getenv("SIMULATION_SEED")
+SIMULATION_SEED = int(_seed) if _seed else None
+
 fake = Faker('en_IN')  # Indian locale for realistic names
+fake.seed_instance(SIMULATION_SEED)
+
+# One PCG64 generator for all simulation randomness
+_rng = np.random.default_rng(SIMULATION_SEED)
+
+# Faker is slow per call; sample patient names from pools built once at startup
+NAME_POOL_SIZE = 10_000
+MALE_NAME_POOL = tuple(fake.name_male() for _ in range(NAME_POOL_SIZE))
+FEMALE_NAME_POOL = tuple(fake.name_female() for _ in range(NAME_POOL_SIZE))
 
 # ============================================================================
 # CONFIGURATION
@@ -80,6 +124,11 @@ class Config:
     NORMAL_PATIENT_INTERVAL = 10      # 10 seconds for demo
     CRISIS_PATIENT_INTERVAL = 5       # 5 seconds in crisis
     ENVIRONMENTAL_UPDATE_INTERVAL = 10  # Update AQI every 10 seconds
+    PATTERN_CHECK_INTERVAL = 1        # Respiratory cluster check
+    
+    # Database writes are batched per table off the simulation thread
+    DB_BATCH_SIZE = 50
+    DB_FLUSH_INTERVAL = 0.5
     
     # Patient generation weights
     RESPIRATORY_PROBABILITY_NORMAL = 0.15
@@ -135,41 +184,74 @@ CARDIAC_COMPLAINTS = [
 ]
 
 
+
+def _weighted_pool(groups: list) -> tuple:
+    """Flatten (complaints, probability) groups into one pool with cumulative weights"""
+    pool, weights = [], []
+    for complaints, probability in groups:
+        pool += complaints
+        weights += [probability / len(complaints)] * len(complaints)
+    return tuple(pool), tuple(accumulate(weights))
+
+# Complaint pools per mode, sampled by searchsorted over the cumulative weights
+CRISIS_COMPLAINT_POOL, CRISIS_CUM_WEIGHTS = _weighted_pool([
+    (RESPIRATORY_COMPLAINTS, Config.RESPIRATORY_PROBABILITY_CRISIS),
+    (NORMAL_COMPLAINTS, 0.92 - Config.RESPIRATORY_PROBABILITY_CRISIS),
+    (CARDIAC_COMPLAINTS, 0.08),
+])
+NORMAL_COMPLAINT_POOL, NORMAL_CUM_WEIGHTS = _weighted_pool([
+    (RESPIRATORY_COMPLAINTS[:4], Config.RESPIRATORY_PROBABILITY_NORMAL),  # Milder respiratory
+    (NORMAL_COMPLAINTS, 0.95 - Config.RESPIRATORY_PROBABILITY_NORMAL),
+    (CARDIAC_COMPLAINTS, 0.05),
+])
+
+
 # ============================================================================
 # VITAL SIGNS GENERATORS
 # ============================================================================
 
-def generate_stable_vitals() -> dict:
-    """Generate normal/stable vital signs"""
+VITAL_FIELDS = ("bp_systolic", "bp_diastolic", "heart_rate", "respiratory_rate", "spo2", "temperature")
+
+
+def _either(low: tuple, high: tuple, n: int) -> np.ndarray:
+    """Draw n ints, each from the low or the high range with equal chance"""
+    return np.where(
+        _rng.random(n) < 0.5,
+        _rng.integers(low[0], low[1], n, endpoint=True),
+        _rng.integers(high[0], high[1], n, endpoint=True),
+    )
+
+def generate_stable_vitals_batch(n: int) -> dict:
+    """Generate n sets of normal/stable vital signs as per-field arrays"""
     return {
-        "bp_systolic": random.randint(110, 135),
-        "bp_diastolic": random.randint(70, 85),
-        "heart_rate": random.randint(65, 90),
-        "respiratory_rate": random.randint(12, 18),
-        "spo2": random.randint(96, 100),
-        "temperature": round(random.uniform(36.4, 37.2), 1),
+        "bp_systolic": _rng.integers(110, 135, n, endpoint=True),
+        "bp_diastolic": _rng.integers(70, 85, n, endpoint=True),
+        "heart_rate": _rng.integers(65, 90, n, endpoint=True),
+        "respiratory_rate": _rng.integers(12, 18, n, endpoint=True),
+        "spo2": _rng.integers(96, 100, n, endpoint=True),
+        "temperature": np.round(_rng.uniform(36.4, 37.2, n), 1),
     }
 
-def generate_respiratory_distress_vitals() -> dict:
-    """Generate vital signs consistent with respiratory distress"""
+def generate_respiratory_distress_vitals_batch(n: int) -> dict:
+    """Generate n sets of vital signs consistent with respiratory distress"""
     return {
-        "bp_systolic": random.randint(130, 160),  # Elevated from stress
-        "bp_diastolic": random.randint(80, 100),
-        "heart_rate": random.randint(100, 130),   # Tachycardia
-        "respiratory_rate": random.randint(24, 35), # Tachypnea
-        "spo2": random.randint(84, 92),           # Hypoxia
-        "temperature": round(random.uniform(36.8, 38.0), 1),
+        "bp_systolic": _rng.integers(130, 160, n, endpoint=True),  # Elevated from stress
+        "bp_diastolic": _rng.integers(80, 100, n, endpoint=True),
+        "heart_rate": _rng.integers(100, 130, n, endpoint=True),   # Tachycardia
+        "respiratory_rate": _rng.integers(24, 35, n, endpoint=True), # Tachypnea
+        "spo2": _rng.integers(84, 92, n, endpoint=True),           # Hypoxia
+        "temperature": np.round(_rng.uniform(36.8, 38.0, n), 1),
     }
 
-def generate_cardiac_vitals() -> dict:
-    """Generate vital signs consistent with cardiac emergency"""
+def generate_cardiac_vitals_batch(n: int) -> dict:
+    """Generate n sets of vital signs consistent with cardiac emergency"""
     return {
-        "bp_systolic": random.choice([random.randint(80, 100), random.randint(160, 190)]),
-        "bp_diastolic": random.randint(60, 110),
-        "heart_rate": random.choice([random.randint(40, 55), random.randint(110, 150)]),
-        "respiratory_rate": random.randint(18, 26),
-        "spo2": random.randint(90, 96),
-        "temperature": round(random.uniform(36.2, 37.0), 1),
+        "bp_systolic": _either((80, 100), (160, 190), n),
+        "bp_diastolic": _rng.integers(60, 110, n, endpoint=True),
+        "heart_rate": _either((40, 55), (110, 150), n),
+        "respiratory_rate": _rng.integers(18, 26, n, endpoint=True),
+        "spo2": _rng.integers(90, 96, n, endpoint=True),
+        "temperature": np.round(_rng.uniform(36.2, 37.0, n), 1),
     }
 
 
@@ -177,116 +259,209 @@ def generate_cardiac_vitals() -> dict:
 # PATIENT GENERATOR
 # ============================================================================
 
+@dataclass(slots=True)
+class Patient:
+    """A generated patient; the MRN is stamped on arrival"""
+    id: str
+    mrn: Optional[str]
+    full_name: str
+    age: int
+    gender: str
+    chief_complaint: str
+    symptom_duration: str
+    severity: int
+    bp_systolic: int
+    bp_diastolic: int
+    heart_rate: int
+    respiratory_rate: int
+    spo2: int
+    temperature: float
+    is_respiratory_case: bool
+    temperature_unit: str = "C"
+    status: str = "waiting"
+    
+    def to_row(self) -> dict:
+        """Database row for the patients table"""
+        return dict(zip(PATIENT_ROW_FIELDS, _patient_row_values(self)))
+
+
+# Columns written to the patients table (is_respiratory_case stays local)
+PATIENT_ROW_FIELDS = (
+    "id", "mrn", "full_name", "age", "gender", "chief_complaint", "symptom_duration",
+    "severity", "temperature_unit", "status", *VITAL_FIELDS,
+)
+_patient_row_values = attrgetter(*PATIENT_ROW_FIELDS)
+
+_MRN_FMT = "MRN-{:X}-{}".format
+
 def generate_mrn() -> str:
     """Generate a human-readable Medical Record Number"""
-    timestamp = hex(int(time.time()))[2:].upper()
-    random_part = ''.join(random.choices('ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789', k=4))
-    return f"MRN-{timestamp}-{random_part}"
+    return _MRN_FMT(time.time_ns() // 1_000_000_000, secrets.token_hex(2).upper())
+
+
+PATIENT_BATCH_SIZE = 64  # Patients drawn per NumPy batch, served one at a time
+
+# Inclusive age ranges per (crisis mode, condition type) as (k, 2) arrays;
+# with several ranges one is picked uniformly
+_AGE_RANGES = {
+    key: np.array(ranges)
+    for key, ranges in {
+        (True, "respiratory"): ((2, 12), (55, 85), (20, 45)),  # Children, elderly, some adults
+        (True, "stable"): ((18, 70),),
+        (True, "cardiac"): ((45, 75),),
+        (False, "respiratory"): ((25, 70),),
+        (False, "stable"): ((5, 80),),
+        (False, "cardiac"): ((50, 80),),
+    }.items()
+}
+_VITALS_BATCH = {
+    "respiratory": generate_respiratory_distress_vitals_batch,
+    "stable": generate_stable_vitals_batch,
+    "cardiac": generate_cardiac_vitals_batch,
+}
+ACUTE_DURATIONS = ("30 minutes", "1 hour", "2 hours", "few hours")
+GRADUAL_DURATIONS = ("6 hours", "1 day", "2 days", "3 days", "1 week")
+
+# Per-mode pool columns as arrays for vectorised lookup
+_POOLS = {
+    crisis: (pool, np.array(cum_weights), np.array([c[1] for c in pool]), np.array([c[2] for c in pool]))
+    for crisis, pool, cum_weights in (
+        (True, CRISIS_COMPLAINT_POOL, CRISIS_CUM_WEIGHTS),
+        (False, NORMAL_COMPLAINT_POOL, NORMAL_CUM_WEIGHTS),
+    )
+}
 
-def generate_patient(crisis_mode: bool, aqi: float) -> dict:
+
+def _draw_ages(ranges: np.ndarray, n: int) -> np.ndarray:
+    """Draw n ages, each from one of the given inclusive ranges chosen uniformly"""
+    bounds = ranges[_rng.integers(len(ranges), size=n)]
+    return _rng.integers(bounds[:, 0], bounds[:, 1], endpoint=True)
+
+def generate_patient_batch(n: int, crisis_mode: bool, aqi: float) -> list:
     """
-    Generate a synthetic patient based on current environmental conditions.
+    Generate n synthetic patients with NumPy, drawing each field for the
+    whole batch at once.
     
     Args:
+        n: Number of patients
         crisis_mode: Whether the system is in crisis mode
         aqi: Current Air Quality Index value
         
     Returns:
-        Patient dictionary ready for database insertion
+        Patients; each still needs its MRN, stamped on arrival
     """
-    # Determine patient type based on mode and AQI
-    if crisis_mode:
-        # In crisis: heavily skew towards respiratory
-        roll = random.random()
-        if roll < Config.RESPIRATORY_PROBABILITY_CRISIS:
-            complaint_data = random.choice(RESPIRATORY_COMPLAINTS)
-            vitals = generate_respiratory_distress_vitals()
-            # Skew age towards vulnerable populations (children and elderly)
-            age = random.choice([
-                random.randint(2, 12),   # Children
-                random.randint(55, 85),  # Elderly
-                random.randint(20, 45),  # Some adults
-            ])
-        elif roll < 0.92:
-            complaint_data = random.choice(NORMAL_COMPLAINTS)
-            vitals = generate_stable_vitals()
-            age = random.randint(18, 70)
-        else:
-            complaint_data = random.choice(CARDIAC_COMPLAINTS)
-            vitals = generate_cardiac_vitals()
-            age = random.randint(45, 75)
-    else:
-        # Normal mode: mostly random complaints
-        roll = random.random()
-        if roll < Config.RESPIRATORY_PROBABILITY_NORMAL:
-            complaint_data = random.choice(RESPIRATORY_COMPLAINTS[:4])  # Milder respiratory
-            vitals = generate_respiratory_distress_vitals()
-            vitals["spo2"] = random.randint(91, 95)  # Less severe
-            vitals["respiratory_rate"] = random.randint(20, 26)
-            age = random.randint(25, 70)
-        elif roll < 0.95:
-            complaint_data = random.choice(NORMAL_COMPLAINTS)
-            vitals = generate_stable_vitals()
-            age = random.randint(5, 80)
-        else:
-            complaint_data = random.choice(CARDIAC_COMPLAINTS)
-            vitals = generate_cardiac_vitals()
-            age = random.randint(50, 80)
+    # Determine patient type based on mode and AQI: one weighted draw each
+    pool, cum_weights, severities, types = _POOLS[crisis_mode]
+    picks = np.searchsorted(cum_weights, _rng.random(n) * cum_weights[-1], side="right")
+    picked_types = types[picks]
     
-    chief_complaint, severity, condition_type = complaint_data
+    # Vitals and age per condition type
+    vitals = {field: np.empty(n, dtype=np.float64 if field == "temperature" else np.int64) for field in VITAL_FIELDS}
+    ages = np.empty(n, dtype=np.int64)
+    for condition_type, batch_fn in _VITALS_BATCH.items():
+        mask = picked_types == condition_type
+        count = int(mask.sum())
+        if not count:
+            continue
+        for field, column in batch_fn(count).items():
+            vitals[field][mask] = column
+        ages[mask] = _draw_ages(_AGE_RANGES[(crisis_mode, condition_type)], count)
+        if condition_type == "respiratory" and not crisis_mode:
+            # Normal mode respiratory cases are less severe
+            vitals["spo2"][mask] = _rng.integers(91, 95, count, endpoint=True)
+            vitals["respiratory_rate"][mask] = _rng.integers(20, 26, count, endpoint=True)
     
-    # Generate patient demographics
-    gender = random.choice(["male", "female"])
-    if gender == "male":
-        name = fake.name_male()
-    else:
-        name = fake.name_female()
+    # Tagged here from the complaint table; not written to the database
+    respiratory = (picked_types == "respiratory") | (vitals["spo2"] < 93)
     
-    # Determine symptom duration
-    if severity >= 7:
-        duration = random.choice(["30 minutes", "1 hour", "2 hours", "few hours"])
-    else:
-        duration = random.choice(["6 hours", "1 day", "2 days", "3 days", "1 week"])
-    
-    # Build patient record
-    patient = {
-        "id": str(uuid.uuid4()),
-        "mrn": generate_mrn(),
-        "full_name": name,
-        "age": age,
-        "gender": gender,
-        "chief_complaint": chief_complaint,
-        "symptom_duration": duration,
-        "severity": severity,
-        "temperature_unit": "C",
-        "status": "waiting",
-        **vitals
-    }
+    # Demographics and symptom duration
+    male = _rng.random(n) < 0.5
+    names = _rng.integers(NAME_POOL_SIZE, size=n)
+    acute = severities[picks] >= 7
+    durations = np.where(
+        acute,
+        _rng.integers(len(ACUTE_DURATIONS), size=n),
+        _rng.integers(len(GRADUAL_DURATIONS), size=n),
+    )
     
+    patients = []
+    for pick, age, is_male, name, is_acute, duration, is_respiratory, *vital_values in zip(
+        picks.tolist(), ages.tolist(), male.tolist(), names.tolist(),
+        acute.tolist(), durations.tolist(), respiratory.tolist(),
+        *(vitals[field].tolist() for field in VITAL_FIELDS),
+    ):
+        chief_complaint, severity, _ = pool[pick]
+        patients.append(Patient(
+            str(uuid.uuid4()),
+            None,
+            (MALE_NAME_POOL if is_male else FEMALE_NAME_POOL)[name],
+            age,
+            "male" if is_male else "female",
+            chief_complaint,
+            (ACUTE_DURATIONS if is_acute else GRADUAL_DURATIONS)[duration],
+            severity,
+            *vital_values,
+            is_respiratory,
+        ))
+    return patients
+
+
+# Pre-generated patients per mode (crisis_mode -> list, served from the end)
+_patient_buffers: dict = {True: [], False: []}
+
+def generate_patient(crisis_mode: bool, aqi: float) -> Patient:
+    """
+    Generate a synthetic patient based on current environmental conditions.
+    
+    Args:
+        crisis_mode: Whether the system is in crisis mode
+        aqi: Current Air Quality Index value
+        
+    Returns:
+        Patient ready for database insertion via to_row()
+    """
+    buffer = _patient_buffers[crisis_mode]
+    if not buffer:
+        buffer.extend(generate_patient_batch(PATIENT_BATCH_SIZE, crisis_mode, aqi))
+    patient = buffer.pop()
+    patient.mrn = generate_mrn()
     return patient
 
 
+# Mode-specialised patient sources, taking only the AQI
+generate_crisis_patient = partial(generate_patient, True)
+generate_normal_patient = partial(generate_patient, False)
+
+
 # ============================================================================
 # ALERT GENERATOR
 # ============================================================================
 
 def generate_environmental_alert(aqi: float, pm25: float) -> Optional[dict]:
     """Generate an environmental alert if AQI is dangerous"""
+    alert = _environmental_alert(int(aqi), int(pm25))
+    return dict(alert) if alert else None
+
+
+@lru_cache(maxsize=512)
+def _environmental_alert(aqi: int, pm25: int) -> Optional[dict]:
+    """Build the alert for whole-number readings; callers get a copy"""
+    # Thresholds are whole numbers, so the truncated AQI picks the same tier
     if aqi < Config.AQI_UNHEALTHY_MAX:
         return None
     
     if aqi >= Config.AQI_HAZARDOUS_MAX - 50:
         severity = "critical"
         title = "HAZARDOUS AIR QUALITY EMERGENCY"
-        message = f"PM2.5 sensors reading {int(pm25)} µg/m³. AQI at {int(aqi)}. Immediate respiratory surge expected. Activate all emergency protocols."
+        message = f"PM2.5 sensors reading {pm25} µg/m³. AQI at {aqi}. Immediate respiratory surge expected. Activate all emergency protocols."
     elif aqi >= Config.AQI_VERY_UNHEALTHY_MAX:
         severity = "critical"
         title = "Very Unhealthy Air Quality Alert"
-        message = f"AQI has reached {int(aqi)}. Expecting 40% increase in respiratory presentations. Pre-position nebulizer equipment."
+        message = f"AQI has reached {aqi}. Expecting 40% increase in respiratory presentations. Pre-position nebulizer equipment."
     else:
         severity = "warning"
         title = "Elevated Air Quality Warning"
-        message = f"AQI at {int(aqi)}. Monitoring for potential respiratory surge. Sensitive populations at risk."
+        message = f"AQI at {aqi}. Monitoring for potential respiratory surge. Sensitive populations at risk."
     
     return {
         "type": "environmental",
@@ -317,20 +492,61 @@ def generate_pattern_alert(respiratory_count: int, time_window: int) -> Optional
 # ENVIRONMENTAL MODEL
 # ============================================================================
 
+# Per-update bounds for (PM2.5 ratio, PM10 ratio, temperature drift, humidity drift)
+_DRIFT_LOW = np.array([0.7, 1.1, -0.5, -2.0])
+_DRIFT_HIGH = np.array([0.9, 1.4, 0.5, 2.0])
+
+# Crisis phases, each with its AQI noise (low, span) applied as low + r * span;
+# decay noise is already negated, so every phase adds its step
+CRISIS_BUILDUP, CRISIS_PEAK, CRISIS_DECAY = range(3)
+_CRISIS_PEAK_AQI = Config.AQI_HAZARDOUS_MAX - 100  # Buildup ends here
+_CRISIS_NOISE = ((-3, 8), (-10, 20), (-3, 5))
+
+
+def crisis_step(aqi: float, crisis_timer: int, peak_ticks: float,
+                buildup_rate: float, decay_rate: float, r: float) -> tuple:
+    """
+    Advance one crisis tick as pure arithmetic.
+    
+    Args:
+        aqi: Current AQI
+        crisis_timer: Ticks spent at peak so far
+        peak_ticks: Ticks to hold the peak before decaying
+        buildup_rate: AQI increase per tick while building up
+        decay_rate: AQI decrease per tick while recovering
+        r: Uniform draw in [0, 1) for the phase's noise
+        
+    Returns:
+        (aqi, crisis_timer, phase); aqi is unclamped
+    """
+    past_buildup = aqi >= _CRISIS_PEAK_AQI
+    past_peak = crisis_timer >= peak_ticks
+    phase = past_buildup * (1 + past_peak)
+    low, span = _CRISIS_NOISE[phase]
+    aqi += (buildup_rate, 0, -decay_rate)[phase] + low + r * span
+    return aqi, crisis_timer + (phase == CRISIS_PEAK), phase
+
+
 class EnvironmentalModel:
     """
     Simulates environmental conditions with realistic fluctuations.
     Uses weighted stochastic logic to mimic actual pollution patterns.
     """
     
+    __slots__ = (
+        "aqi", "pm25", "pm10", "temperature", "humidity",
+        "crisis_mode", "crisis_timer", "time_in_crisis",
+        "crisis_buildup_rate", "crisis_peak_duration", "crisis_decay_rate",
+    )
+    
     def __init__(self, start_in_crisis: bool = False):
-        self.aqi = Config.AQI_NORMAL_MAX if start_in_crisis else random.uniform(
+        self.aqi = Config.AQI_NORMAL_MAX if start_in_crisis else _rng.uniform(
             Config.AQI_NORMAL_MIN, Config.AQI_NORMAL_MAX
         )
         self.pm25 = self.aqi * 0.8
         self.pm10 = self.aqi * 1.2
-        self.temperature = random.uniform(18, 32)
-        self.humidity = random.uniform(40, 70)
+        self.temperature = _rng.uniform(18, 32)
+        self.humidity = _rng.uniform(40, 70)
         self.crisis_mode = start_in_crisis
         self.crisis_timer = 0
         self.time_in_crisis = 0
@@ -340,73 +556,66 @@ class EnvironmentalModel:
         self.crisis_peak_duration = 300  # 5 minutes at peak
         self.crisis_decay_rate = 8  # AQI decrease per update during recovery
         
-    def update(self) -> dict:
+    def update(self, now: Optional[float] = None) -> dict:
         """Update environmental conditions"""
         if self.crisis_mode:
             self._update_crisis()
         else:
             self._update_normal()
         
-        # Update related values
-        self.pm25 = self.aqi * random.uniform(0.7, 0.9)
-        self.pm10 = self.aqi * random.uniform(1.1, 1.4)
-        self.temperature += random.uniform(-0.5, 0.5)
-        self.humidity += random.uniform(-2, 2)
-        
-        # Clamp values
-        self.temperature = max(15, min(42, self.temperature))
-        self.humidity = max(20, min(95, self.humidity))
+        # Update related values from one draw, clamping as we go
+        pm25_ratio, pm10_ratio, temperature_drift, humidity_drift = _rng.uniform(_DRIFT_LOW, _DRIFT_HIGH).tolist()
+        self.pm25 = self.aqi * pm25_ratio
+        self.pm10 = self.aqi * pm10_ratio
+        self.temperature = max(15, min(42, self.temperature + temperature_drift))
+        self.humidity = max(20, min(95, self.humidity + humidity_drift))
         
-        return self.get_state()
+        return self.get_state(now)
     
     def _update_normal(self):
         """Normal mode: gentle fluctuations"""
-        change = random.uniform(-5, 7)  # Slight upward bias
+        change = _rng.uniform(-5, 7)  # Slight upward bias
         self.aqi = max(Config.AQI_NORMAL_MIN, min(Config.AQI_MODERATE_MAX, self.aqi + change))
         
         # Random chance to trigger crisis (simulating sudden pollution event)
-        if random.random() < 0.02:  # 2% chance per update
+        if _rng.random() < 0.02:  # 2% chance per update
             self.crisis_mode = True
-            print("\n🔴 CRISIS TRIGGERED: Environmental emergency beginning!")
+            logger.info("\n🔴 CRISIS TRIGGERED: Environmental emergency beginning!")
             
     def _update_crisis(self):
         """Crisis mode: rapid AQI increase then plateau then decrease"""
         self.time_in_crisis += 1
+        normal_min, moderate_max = Config.AQI_NORMAL_MIN, Config.AQI_MODERATE_MAX
         
-        if self.aqi < Config.AQI_HAZARDOUS_MAX - 100:
-            # Building up
-            self.aqi += self.crisis_buildup_rate + random.uniform(-3, 5)
-        elif self.crisis_timer < self.crisis_peak_duration / Config.ENVIRONMENTAL_UPDATE_INTERVAL:
-            # At peak
-            self.crisis_timer += 1
-            self.aqi += random.uniform(-10, 10)
-        else:
-            # Decay phase
-            self.aqi -= self.crisis_decay_rate + random.uniform(-2, 3)
-            
-            if self.aqi < Config.AQI_MODERATE_MAX:
-                self.crisis_mode = False
-                self.crisis_timer = 0
-                self.time_in_crisis = 0
-                print("\n🟢 Crisis resolved. Returning to normal operations.")
+        aqi, self.crisis_timer, phase = crisis_step(
+            self.aqi, self.crisis_timer,
+            self.crisis_peak_duration / Config.ENVIRONMENTAL_UPDATE_INTERVAL,
+            self.crisis_buildup_rate, self.crisis_decay_rate, _rng.random(),
+        )
+        
+        if phase == CRISIS_DECAY and aqi < moderate_max:
+            self.crisis_mode = False
+            self.crisis_timer = 0
+            self.time_in_crisis = 0
+            logger.info("\n🟢 Crisis resolved. Returning to normal operations.")
         
-        self.aqi = max(Config.AQI_NORMAL_MIN, min(500, self.aqi))
+        self.aqi = max(normal_min, min(500, aqi))
     
     def force_crisis(self):
         """Manually trigger crisis mode"""
         self.crisis_mode = True
         self.aqi = Config.AQI_VERY_UNHEALTHY_MAX
-        print("\n🔴 MANUAL CRISIS TRIGGER: Environmental emergency activated!")
+        logger.info("\n🔴 MANUAL CRISIS TRIGGER: Environmental emergency activated!")
     
-    def get_state(self) -> dict:
-        """Get current environmental state"""
+    def get_state(self, now: Optional[float] = None) -> dict:
+        """Get current environmental state (timestamped at now, default the current time)"""
         return {
             "aqi": round(self.aqi, 1),
             "pm25": round(self.pm25, 1),
             "pm10": round(self.pm10, 1),
             "temperature": round(self.temperature, 1),
             "humidity": round(self.humidity, 1),
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now)),
         }
     
     def is_crisis(self) -> bool:
@@ -429,10 +638,13 @@ class SimulationAgent:
         self.force_normal = force_normal
         self.patients_generated = 0
         self.alerts_generated = 0
-        self.respiratory_count_window = []  # Track respiratory cases
-        self.last_env_update = time.time()
-        self.last_patient_time = time.time()
+        self.respiratory_count_window: deque = deque()  # Respiratory case times, oldest first
         self.last_alert_aqi = 0
+        self._apply_mode()
+        
+        # (table, row) pairs for the database writer task; None stops it.
+        # Patients are queued as Patient and turned into rows by the writer
+        self.db_queue: "asyncio.Queue[Optional[tuple]]" = asyncio.Queue()
         
     def run(self):
         """Main simulation loop"""
@@ -446,32 +658,13 @@ class SimulationAgent:
         print(f"   Crisis Mode: {'ACTIVE' if self.environment.crisis_mode else 'Standby'}")
         print("\n   Press Ctrl+C to stop\n")
         print("-" * 60)
+        _log_listener.start()
         
         try:
-            while True:
-                current_time = time.time()
-                
-                # Update environment periodically
-                if current_time - self.last_env_update >= Config.ENVIRONMENTAL_UPDATE_INTERVAL:
-                    self._update_environment()
-                    self.last_env_update = current_time
-                
-                # Determine patient generation interval
-                is_crisis = self.environment.is_crisis() and not self.force_normal
-                interval = Config.CRISIS_PATIENT_INTERVAL if is_crisis else Config.NORMAL_PATIENT_INTERVAL
-                
-                # Generate patient
-                if current_time - self.last_patient_time >= interval:
-                    self._generate_patient(is_crisis)
-                    self.last_patient_time = current_time
-                
-                # Check for pattern alerts
-                self._check_patterns()
-                
-                # Sleep briefly to prevent CPU spinning
-                time.sleep(1)
-                
+            asyncio.run(self._run())
         except KeyboardInterrupt:
+            # Flush queued output before the summary
+            _log_listener.stop()
             print("\n\n" + "=" * 60)
             print("  SIMULATION TERMINATED")
             print("=" * 60)
@@ -480,20 +673,69 @@ class SimulationAgent:
             print(f"  Final AQI: {self.environment.aqi:.1f}")
             print("=" * 60)
     
-    def _update_environment(self):
+    async def _run(self):
+        """Run the tickers concurrently with the database writer until cancelled"""
+        writer = None if DEMO_MODE else asyncio.create_task(self._db_worker())
+        try:
+            async with asyncio.TaskGroup() as tickers:
+                tickers.create_task(self._env_ticker())
+                tickers.create_task(self._patient_ticker())
+                tickers.create_task(self._pattern_ticker())
+        finally:
+            # Flush rows still waiting for the database
+            if writer is not None:
+                self.db_queue.put_nowait(None)
+                try:
+                    await asyncio.wait_for(writer, 5)
+                except asyncio.TimeoutError:
+                    pass
+    
+    async def _env_ticker(self):
+        """Update the environment periodically"""
+        interval = Config.ENVIRONMENTAL_UPDATE_INTERVAL
+        while True:
+            await asyncio.sleep(interval)
+            self._update_environment(time.time())
+    
+    async def _patient_ticker(self):
+        """Generate patients, each paced by the mode current when it arrives"""
+        while True:
+            await asyncio.sleep(self.patient_interval)
+            self._generate_patient(time.time())
+    
+    async def _pattern_ticker(self):
+        """Check for pattern alerts, starting immediately"""
+        interval = Config.PATTERN_CHECK_INTERVAL
+        while True:
+            self._check_patterns(time.time())
+            await asyncio.sleep(interval)
+    
+    def _is_crisis(self) -> bool:
+        return self.environment.is_crisis() and not self.force_normal
+    
+    def _apply_mode(self):
+        """Pick the patient source and arrival interval for the current mode"""
+        if self._is_crisis():
+            self._next_patient = generate_crisis_patient
+            self.patient_interval = Config.CRISIS_PATIENT_INTERVAL
+        else:
+            self._next_patient = generate_normal_patient
+            self.patient_interval = Config.NORMAL_PATIENT_INTERVAL
+    
+    def _update_environment(self, now: float):
         """Update and broadcast environmental conditions"""
-        state = self.environment.update()
+        state = self.environment.update(now)
+        self._apply_mode()
         
         # Print status
         status_icon = "🔴" if self.environment.is_crisis() else "🟢"
-        print(f"\n{status_icon} ENV UPDATE | AQI: {state['aqi']:.0f} | PM2.5: {state['pm25']:.0f} | Temp: {state['temperature']:.1f}°C")
+        logger.info(
+            "\n%s ENV UPDATE | AQI: %.0f | PM2.5: %.0f | Temp: %.1f°C",
+            status_icon, state['aqi'], state['pm25'], state['temperature']
+        )
         
         # Insert environmental data
-        if not DEMO_MODE:
-            try:
-                supabase.table("environmental_data").insert(state).execute()
-            except Exception as e:
-                print(f"   ⚠️  DB Error: {e}")
+        self._insert("environmental_data", state)
         
         # Generate environmental alert if needed
         if abs(state['aqi'] - self.last_alert_aqi) > 50 or (state['aqi'] > 300 and self.last_alert_aqi <= 300):
@@ -502,58 +744,111 @@ class SimulationAgent:
                 self._send_alert(alert)
                 self.last_alert_aqi = state['aqi']
     
-    def _generate_patient(self, crisis_mode: bool):
+    def _generate_patient(self, now: float):
         """Generate and insert a patient"""
-        patient = generate_patient(crisis_mode, self.environment.aqi)
+        patient = self._next_patient(self.environment.aqi)
         
         # Track respiratory cases
-        if "breath" in patient["chief_complaint"].lower() or \
-           "wheez" in patient["chief_complaint"].lower() or \
-           "asthma" in patient["chief_complaint"].lower() or \
-           patient["spo2"] < 93:
-            self.respiratory_count_window.append(time.time())
+        if patient.is_respiratory_case:
+            self.respiratory_count_window.append(now)
         
         # Print patient info
-        severity_indicator = "🔴" if patient["severity"] >= 7 else "🟡" if patient["severity"] >= 5 else "🟢"
-        print(f"   {severity_indicator} NEW PATIENT | {patient['full_name']} | Age: {patient['age']} | Severity: {patient['severity']}/10")
-        print(f"      └─ {patient['chief_complaint'][:60]}{'...' if len(patient['chief_complaint']) > 60 else ''}")
-        print(f"      └─ Vitals: HR {patient['heart_rate']} | RR {patient['respiratory_rate']} | SpO2 {patient['spo2']}%")
+        severity_indicator = "🔴" if patient.severity >= 7 else "🟡" if patient.severity >= 5 else "🟢"
+        complaint = patient.chief_complaint
+        logger.info(
+            "   %s NEW PATIENT | %s | Age: %s | Severity: %s/10\n"
+            "      └─ %s%s\n"
+            "      └─ Vitals: HR %s | RR %s | SpO2 %s%%",
+            severity_indicator, patient.full_name, patient.age, patient.severity,
+            complaint[:60], '...' if len(complaint) > 60 else '',
+            patient.heart_rate, patient.respiratory_rate, patient.spo2
+        )
         
         # Insert patient
-        if not DEMO_MODE:
-            try:
-                supabase.table("patients").insert(patient).execute()
-            except Exception as e:
-                print(f"      ⚠️  DB Error: {e}")
+        self._insert("patients", patient)
         
         self.patients_generated += 1
     
-    def _check_patterns(self):
+    def _check_patterns(self, now: float):
         """Check for patterns that should trigger AI alerts"""
         # Clean old entries (keep last 10 minutes)
-        cutoff = time.time() - 600
-        self.respiratory_count_window = [t for t in self.respiratory_count_window if t > cutoff]
+        window = self.respiratory_count_window
+        cutoff = now - 600
+        while window and window[0] <= cutoff:
+            window.popleft()
         
         # Check for respiratory cluster
-        if len(self.respiratory_count_window) >= 3:
+        if len(window) >= 3:
             # Only alert every 5 minutes
-            recent_count = len([t for t in self.respiratory_count_window if t > time.time() - 300])
-            if recent_count >= 3 and random.random() < 0.3:  # Don't spam alerts
+            recent_count = len(window) - bisect_right(window, now - 300)
+            if recent_count >= 3 and _rng.random() < 0.3:  # Don't spam alerts
                 alert = generate_pattern_alert(recent_count, 5)
                 if alert:
                     self._send_alert(alert)
     
     def _send_alert(self, alert: dict):
         """Send an alert to the database"""
-        print(f"\n   ⚡ ALERT: [{alert['severity'].upper()}] {alert['title']}")
+        logger.info("\n   ⚡ ALERT: [%s] %s", alert['severity'].upper(), alert['title'])
+        
+        self._insert("alerts", alert)
         
+        self.alerts_generated += 1
+    
+    def _insert(self, table: str, row):
+        """Queue a row for the database writer (no-op in demo mode)"""
         if not DEMO_MODE:
+            self.db_queue.put_nowait((table, row))
+    
+    async def _db_worker(self):
+        """Insert queued rows in per-table batches of up to DB_BATCH_SIZE or DB_FLUSH_INTERVAL"""
+        # Patients go over COPY when a DSN is configured
+        pool = None
+        if not USE_REST:
             try:
-                supabase.table("alerts").insert(alert).execute()
+                pool = await asyncpg.create_pool(SUPABASE_DB_URL, min_size=1, max_size=1)
             except Exception as e:
-                print(f"      ⚠️  DB Error: {e}")
+                logger.warning("      ⚠️  Postgres unavailable, using REST inserts: %s", e)
         
-        self.alerts_generated += 1
+        loop = asyncio.get_running_loop()
+        flush_interval, batch_size = Config.DB_FLUSH_INTERVAL, Config.DB_BATCH_SIZE
+        stopping = False
+        while not stopping:
+            item = await self.db_queue.get()
+            batches: dict = {}
+            deadline = loop.time() + flush_interval
+            count = 0
+            while item is not None:
+                table, row = item
+                batches.setdefault(table, []).append(row)
+                count += 1
+                remaining = deadline - loop.time()
+                if count >= batch_size or remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.db_queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                stopping = True
+            
+            for table, rows in batches.items():
+                try:
+                    if table == "patients":
+                        if pool is not None:
+                            await pool.copy_records_to_table(
+                                "patients",
+                                records=[_patient_row_values(patient) for patient in rows],
+                                columns=PATIENT_ROW_FIELDS,
+                            )
+                            continue
+                        rows = [patient.to_row() for patient in rows]
+                    # The Supabase client is synchronous; keep its round-trip off the loop
+                    await asyncio.to_thread(supabase.table(table).insert(rows).execute)
+                except Exception as e:
+                    logger.warning("      ⚠️  DB Error: %s", e)
+        
+        if pool is not None:
+            await pool.close()
 
 
 # ============================================================================